@@ -1,12 +1,13 @@
 import subprocess
 import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from Common.probe_cache import probe_cached
 
 def get_duration(file_path):
-    result = subprocess.run(
-        ['ffprobe', '-i', file_path, '-show_entries', 'format=duration', '-v', 'quiet', '-of', 'csv=p=0'],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    return float(result.stdout.strip())
+    return float(probe_cached(file_path)['format']['duration'])
 
 def process_audio(audio_path, video_duration, audio_duration, choice=None):
     if audio_duration > video_duration:
@@ -1,7 +1,12 @@
-import platform
 import subprocess
 import wx
 import re
+import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.capabilities import list_hardware_encoders
 
 def is_valid_windows_filename(filename: str) -> bool:
     # 检查是否包含非法字符
@@ -25,97 +30,6 @@ def is_valid_windows_filename(filename: str) -> bool:
     # 如果所有检查都通过，返回True
     return True
 
-def auto_encode(selected_codec):
-    # 检测可用的硬件加速单元
-    system_platform = platform.system()
-    h264_support = []
-    hevc_support = []
-    vp8_support = []
-    vp9_support = []
-    av1_support = []
-    prores_support = []
-
-    # 运行FFmpeg命令以列出可用的编码器
-    ffmpeg_output = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True)
-    # 根据平台检查可用的编码器
-    if system_platform in ['Windows', 'Linux']:
-
-        # 检查NVIDIA NVENC支持
-        if "h264_nvenc" in ffmpeg_output.stdout:
-            h264_support.append('nvenc')
-        if "hevc_nvenc" in ffmpeg_output.stdout:
-            hevc_support.append('nvenc')
-        if "av1_nvenc" in ffmpeg_output.stdout:
-            av1_support.append('nvenc')
-        if "prores_nvenc" in ffmpeg_output.stdout:
-            prores_support.append('nvenc')
-        if "vp8_nvenc" in ffmpeg_output.stdout:
-            vp8_support.append('nvenc')
-        if "vp9_nvenc" in ffmpeg_output.stdout:
-            vp9_support.append('nvenc')
-
-        # 检查Intel QSV支持
-        if "h264_qsv" in ffmpeg_output.stdout:
-            h264_support.append('qsv')
-        if "hevc_qsv" in ffmpeg_output.stdout:
-            hevc_support.append('qsv')
-        if "av1_qsv" in ffmpeg_output.stdout:
-            av1_support.append('qsv')
-        if "prores_qsv" in ffmpeg_output.stdout:
-            prores_support.append('qsv')
-        if "vp8_qsv" in ffmpeg_output.stdout:
-            vp8_support.append('qsv')
-        if "vp9_qsv" in ffmpeg_output.stdout:
-            vp9_support.append('qsv')
-
-        # 检查AMD AMF支持
-        if "h264_amf" in ffmpeg_output.stdout:
-            h264_support.append('amf')
-        if "hevc_amf" in ffmpeg_output.stdout:
-            hevc_support.append('amf')
-        if "av1_amf" in ffmpeg_output.stdout:
-            av1_support.append('amf')
-        if "prores_amf" in ffmpeg_output.stdout:
-            prores_support.append('amf')
-        if "vp8_amf" in ffmpeg_output.stdout:
-            vp8_support.append('amf')
-        if "vp9_amf" in ffmpeg_output.stdout:
-            vp9_support.append('amf')
-
-    elif system_platform == 'Darwin':  # macOS 平台
-        if "h264_videotoolbox" in ffmpeg_output.stdout:
-            h264_support.append('videotoolbox')
-        if "hevc_videotoolbox" in ffmpeg_output.stdout:
-            hevc_support.append('videotoolbox')
-        if 'prores_videotoolbox' in ffmpeg_output.stdout:
-            prores_support.append('videotoolbox')
-        if 'av1_videotoolbox' in ffmpeg_output.stdout:
-            av1_support.append('videotoolbox')
-        if 'vp8_videotoolbox' in ffmpeg_output.stdout:
-            vp8_support.append('videotoolbox')
-        if 'vp9_videotoolbox' in ffmpeg_output.stdout:
-            vp9_support.append('videotoolbox')
-
-    if selected_codec == 'h264':
-        h264_support += ['cpu']
-        return h264_support
-    elif selected_codec == 'hevc':
-        hevc_support += ['cpu']
-        return hevc_support
-    elif selected_codec == 'av1':
-        av1_support += ['cpu']
-        return av1_support
-    elif selected_codec == 'prores':
-        prores_support += ['cpu']
-        return prores_support
-    elif selected_codec == 'vp8':
-        vp8_support += ['cpu']
-        return vp8_support
-    elif selected_codec == 'vp9':
-        vp9_support += ['cpu']
-        return vp9_support
-    else:
-        return ['cpu']
 
 class CodecTransformerWX(wx.Frame):
     def __init__(self, *args, **kw):
@@ -229,7 +143,7 @@ class CodecTransformerWX(wx.Frame):
         elif self.encode_mode.GetStringSelection() == 'prores':
             self.output_format.Set(['.mov'])
 
-        support_encoders_list = auto_encode(self.encode_mode.GetStringSelection())
+        support_encoders_list = list_hardware_encoders(self.encode_mode.GetStringSelection())
         self.encoder_choice.Set(support_encoders_list)
 
     def on_transform(self, event):
@@ -1,130 +1,54 @@
-import platform
 import subprocess
+import os
+import sys
 
-def auto_encode(selected_codec):
-    # 检测可用的硬件加速单元
-    system_platform = platform.system()
-    h264_support = []
-    hevc_support = []
-    vp8_support = []
-    vp9_support = []
-    av1_support = []
-    prores_support = []
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.keyframe_index import plan_seek
+from Common.capabilities import auto_encode
+from Common.chunking import probe_streams, encode_chunked
+from Common.passthrough import plan_passthrough, run_passthrough
 
-    # 运行FFmpeg命令以列出可用的编码器
-    ffmpeg_output = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True)
-    # 根据平台检查可用的编码器
-    if system_platform in ['Windows', 'Linux']:
-
-        # 检查NVIDIA NVENC支持
-        if "h264_nvenc" in ffmpeg_output.stdout:
-            h264_support.append('nvenc')
-        if "hevc_nvenc" in ffmpeg_output.stdout:
-            hevc_support.append('nvenc')
-        if "av1_nvenc" in ffmpeg_output.stdout:
-            av1_support.append('nvenc')
-        if "prores_nvenc" in ffmpeg_output.stdout:
-            prores_support.append('nvenc')
-        if "vp8_nvenc" in ffmpeg_output.stdout:
-            vp8_support.append('nvenc')
-        if "vp9_nvenc" in ffmpeg_output.stdout:
-            vp9_support.append('nvenc')
-
-        # 检查Intel QSV支持
-        if "h264_qsv" in ffmpeg_output.stdout:
-            h264_support.append('qsv')
-        if "hevc_qsv" in ffmpeg_output.stdout:
-            hevc_support.append('qsv')
-        if "av1_qsv" in ffmpeg_output.stdout:
-            av1_support.append('qsv')
-        if "prores_qsv" in ffmpeg_output.stdout:
-            prores_support.append('qsv')
-        if "vp8_qsv" in ffmpeg_output.stdout:
-            vp8_support.append('qsv')
-        if "vp9_qsv" in ffmpeg_output.stdout:
-            vp9_support.append('qsv')
-
-        # 检查AMD AMF支持
-        if "h264_amf" in ffmpeg_output.stdout:
-            h264_support.append('amf')
-        if "hevc_amf" in ffmpeg_output.stdout:
-            hevc_support.append('amf')
-        if "av1_amf" in ffmpeg_output.stdout:
-            av1_support.append('amf')
-        if "prores_amf" in ffmpeg_output.stdout:
-            prores_support.append('amf')
-        if "vp8_amf" in ffmpeg_output.stdout:
-            vp8_support.append('amf')
-        if "vp9_amf" in ffmpeg_output.stdout:
-            vp9_support.append('amf')
-
-    elif system_platform == 'Darwin':  # macOS 平台
-        if "h264_videotoolbox" in ffmpeg_output.stdout:
-            h264_support.append('videotoolbox')
-        if "hevc_videotoolbox" in ffmpeg_output.stdout:
-            hevc_support.append('videotoolbox')
-        if 'prores_videotoolbox' in ffmpeg_output.stdout:
-            prores_support.append('videotoolbox')
-        if 'av1_videotoolbox' in ffmpeg_output.stdout:
-            av1_support.append('videotoolbox')
-        if 'vp8_videotoolbox' in ffmpeg_output.stdout:
-            vp8_support.append('videotoolbox')
-        if 'vp9_videotoolbox' in ffmpeg_output.stdout:
-            vp9_support.append('videotoolbox')
-
-    if selected_codec == 'h264':
-        if h264_support:
-            return h264_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'hevc':
-        if hevc_support:
-            return hevc_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'av1':
-        if av1_support:
-            return av1_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'prores':
-        if prores_support:
-            return prores_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp8':
-        if vp8_support:
-            return vp8_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp9':
-        if vp9_support:
-            return vp9_support[0]
-        else:
-            return 'cpu'
-    else:
-        return 'cpu'
-
-def encode_video(input_file, output_file, codec, file_extension, start_time=0):
+def encode_video(input_file, output_file, codec, file_extension, start_time=0, chunked=False, workers=None,
+                 scene_threshold=None):
     # 自动添加文件扩展名到输出文件
     output_file_with_extension = f"{output_file}.{file_extension}"
 
-    # 基本的FFmpeg命令
-    ffmpeg_command = ['ffmpeg', '-i', input_file]
+    # 源文件已经是所需编码时不再重新编码
+    try:
+        plan, reason = plan_passthrough(probe_streams(input_file), input_file, output_file_with_extension, codec=codec,
+                                        start_time=start_time)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        plan, reason = 'encode', f'cannot probe source: {e}'
+    print(f"Plan: {plan} ({reason})")
+    if plan != 'encode':
+        try:
+            run_passthrough(plan, input_file, output_file_with_extension)
+            return
+        except (subprocess.CalledProcessError, OSError) as e:
+            # 流复制失败（例如封装不支持某条流）时退回正常编码
+            print(f"Passthrough failed ({e}), re-encoding")
 
     # 根据检测到的硬件加速类型设置相应的编码器
     codec_process = auto_encode(codec)
     if codec_process != 'cpu':
-        ffmpeg_command.extend(['-c:v', f'{codec}_{codec_process}'])
+        video_options = ['-c:v', f'{codec}_{codec_process}']
     else:
-        ffmpeg_command.extend(['-c:v', codec])
+        video_options = ['-c:v', codec]
 
-    # 如果指定了开始时间，则添加此选项
-    if start_time > 0:
-        ffmpeg_command.extend(['-ss', str(start_time)])
+    # 分块模式：各块并行编码后拼接
+    if chunked:
+        success, result = encode_chunked(input_file, output_file_with_extension, video_options, start_time,
+                                         workers, scene_threshold=scene_threshold)
+        if not success:
+            print("Fail to encode:", result)
+        return
 
-    # 添加输出文件路径（包含自动添加的扩展名）
-    ffmpeg_command.append(output_file_with_extension)
+    # 开始时间：输入端粗定位到之前的关键帧，输出端精确定位，不再解码并丢弃起点之前的全部内容
+    input_seek, output_seek = plan_seek(input_file, start_time)
+
+    # 基本的FFmpeg命令，添加输出文件路径（包含自动添加的扩展名）
+    ffmpeg_command = ['ffmpeg', *input_seek, '-i', input_file, *output_seek, *video_options, output_file_with_extension]
 
     # 打印并运行FFmpeg命令
     print("Running:", ' '.join(ffmpeg_command))
@@ -138,5 +62,12 @@ if __name__ == "__main__":
     file_extension = input("Enter the desired file extension (mp4, mov, mkv, webm): ").strip().lower()
     start_time = int(input("Enter the start time in seconds (default is 0): ").strip() or "0")
 
+    # 分块并行编码
+    chunked = input("Use chunked parallel encoding? (y/n): ").strip().lower() == 'y'
+    scene_threshold = None
+    if chunked:
+        scene_threshold = input("Enter a scene threshold to split at scene cuts (e.g. 0.4, Enter for keyframes): ").strip()
+        scene_threshold = float(scene_threshold) if scene_threshold else None
+
     # 调用编码函数进行视频编码
-    encode_video(input_file, output_file, codec, file_extension, start_time)
+    encode_video(input_file, output_file, codec, file_extension, start_time, chunked, scene_threshold=scene_threshold)
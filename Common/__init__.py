@@ -0,0 +1,4 @@
+import os
+
+# 各工具共用的缓存目录
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.video_expert')
@@ -0,0 +1,121 @@
+import subprocess
+import platform
+import tempfile
+import shutil
+import json
+import os
+
+from . import CACHE_DIR
+
+# 编码器能力缓存：按 ffmpeg 可执行文件（路径、大小、修改时间）保存检测到的编码器、滤镜和像素格式
+CAPABILITIES_PATH = os.path.join(CACHE_DIR, 'capabilities.json')
+# 各平台按优先级检查的硬件编码器
+HARDWARE_ENCODERS = {
+    'Windows': ['nvenc', 'qsv', 'amf'],
+    'Linux': ['nvenc', 'qsv', 'amf'],
+    'Darwin': ['videotoolbox']
+}
+SUPPORTED_CODECS = ['h264', 'hevc', 'vp8', 'vp9', 'av1', 'prores']
+capabilities_memo = {}
+
+def get_ffmpeg_key(ffmpeg):
+    ffmpeg_path = os.path.realpath(shutil.which(ffmpeg) or ffmpeg)
+    stat = os.stat(ffmpeg_path)
+    return f'{ffmpeg_path}|{stat.st_size}|{stat.st_mtime_ns}'
+
+def load_capabilities_file():
+    try:
+        with open(CAPABILITIES_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_capabilities(key, capabilities):
+    # 与其他工具写入的内容合并后原子地保存
+    all_capabilities = load_capabilities_file()
+    all_capabilities[key] = capabilities
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(all_capabilities, f)
+        os.replace(temp_path, CAPABILITIES_PATH)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# 解析 ffmpeg -encoders / -filters / -pix_fmts 的输出，只取名称列
+def parse_ffmpeg_list(output, separator):
+    names = []
+    started = separator is None
+    for line in output.splitlines():
+        if not started:
+            started = line.strip().startswith(separator)
+            continue
+        parts = line.split()
+        if separator is None:
+            # -filters 没有分隔行，条目形如 "T.C hqdn3d V->V ..."
+            if len(parts) >= 3 and '->' in parts[2]:
+                names.append(parts[1])
+        elif len(parts) >= 2:
+            names.append(parts[1])
+    return names
+
+# 检测一次 ffmpeg 的能力，之后从内存或磁盘缓存中读取
+def get_capabilities(ffmpeg='ffmpeg'):
+    key = get_ffmpeg_key(ffmpeg)
+    if key in capabilities_memo:
+        return key, capabilities_memo[key]
+
+    capabilities = load_capabilities_file().get(key)
+    if capabilities is None:
+        def run(option):
+            return subprocess.run([ffmpeg, '-hide_banner', option], capture_output=True, text=True).stdout
+        version = run('-version').splitlines()
+        capabilities = {
+            'version': version[0] if version else '',
+            'encoders': parse_ffmpeg_list(run('-encoders'), '------'),
+            'filters': parse_ffmpeg_list(run('-filters'), None),
+            'pix_fmts': parse_ffmpeg_list(run('-pix_fmts'), '-----'),
+            'verified': {}
+        }
+        save_capabilities(key, capabilities)
+    capabilities_memo[key] = capabilities
+    return key, capabilities
+
+# 用 lavfi 测试源做一次很小的试编码，确认编码器真的可用（结果会被缓存）
+def is_encoder_usable(encoder, verify=True, ffmpeg='ffmpeg'):
+    key, capabilities = get_capabilities(ffmpeg)
+    if encoder not in capabilities['encoders']:
+        return False
+    if not verify:
+        return True
+    if encoder not in capabilities['verified']:
+        try:
+            result = subprocess.run(
+                [ffmpeg, '-hide_banner', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=256x256:rate=25',
+                 '-frames:v', '3', '-c:v', encoder, '-f', 'null', '-'],
+                capture_output=True, timeout=60
+            )
+            capabilities['verified'][encoder] = result.returncode == 0
+        except subprocess.TimeoutExpired:
+            capabilities['verified'][encoder] = False
+        save_capabilities(key, capabilities)
+    return capabilities['verified'][encoder]
+
+def auto_encode(selected_codec, verify=True):
+    # 检测可用的硬件加速单元，按平台优先级返回第一个可用的，否则使用 CPU
+    if selected_codec in SUPPORTED_CODECS:
+        for hardware in HARDWARE_ENCODERS.get(platform.system(), []):
+            if is_encoder_usable(f'{selected_codec}_{hardware}', verify):
+                return hardware
+    return 'cpu'
+
+def list_hardware_encoders(selected_codec, verify=True):
+    # 检测可用的硬件加速单元，按平台优先级列出所有可用的，最后是 CPU
+    support = []
+    if selected_codec in SUPPORTED_CODECS:
+        for hardware in HARDWARE_ENCODERS.get(platform.system(), []):
+            if is_encoder_usable(f'{selected_codec}_{hardware}', verify):
+                support.append(hardware)
+    return support + ['cpu']
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import tempfile
+import json
+import os
+
+from .capabilities import HARDWARE_ENCODERS
+from .keyframe_index import load_keyframe_index
+from .scenes import detect_scenes
+
+# 分块并行编码：在关键帧或场景切换处切分，各块独立编码后用 concat 分离器无损拼接
+CHUNK_SECONDS = 20
+# 每个编码进程使用的线程数；并行的块数为 CPU 核数除以它（至少 2 块）
+CHUNK_THREADS = 4
+# 硬件编码器的并行块数上限：消费级显卡限制同时打开的编码会话数
+HARDWARE_CHUNK_WORKERS = 2
+
+def probe_streams(video_path):
+    # 获取时长、码率以及各条流的编码、像素格式、帧率和时长
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries",
+         "format=duration,bit_rate:stream=codec_type,codec_name,pix_fmt,duration,r_frame_rate,avg_frame_rate,bit_rate",
+         "-of", "json", video_path],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+# 切分点都是相对容器起始时间的秒数，与 format.duration 和输入端 -ss 使用同一个零点
+def get_chunk_cut_points(video_path, scene_threshold=None):
+    if scene_threshold:
+        # 场景切换点：编码器本来就会在这里放置关键帧，切分不会损失画质；检测只处理缩小的灰度帧
+        return detect_scenes(video_path, scene_threshold)
+
+    # 关键帧：使用缓存的关键帧索引，输入端 -ss 可以直接定位到这里
+    index = load_keyframe_index(video_path)
+    origin = index['start_time']
+    # 舍入到微秒，避免浮点误差让恰好等于块长的间隔被判为不足
+    return [round(t - origin, 6) for t in index['keyframe_times']]
+
+def plan_chunks(cut_points, start, duration, chunk_seconds=CHUNK_SECONDS):
+    # 从切分点中贪心地选取边界，使每块不短于 chunk_seconds
+    boundaries = [start]
+    for point in cut_points:
+        if point - boundaries[-1] >= chunk_seconds and duration - point >= chunk_seconds / 2:
+            boundaries.append(point)
+    boundaries.append(duration)
+    return [(boundaries[i], boundaries[i + 1] - boundaries[i]) for i in range(len(boundaries) - 1)]
+
+def encode_chunk(input_file, chunk_start, chunk_length, video_options, threads, chunk_path):
+    command = [
+        "ffmpeg", "-y", "-v", "error", "-nostdin", "-ss", str(chunk_start), "-i", input_file,
+        "-t", str(chunk_length), "-map", "0:v:0", "-an"
+    ] + video_options + ["-threads", str(threads), chunk_path]
+    try:
+        subprocess.run(command, check=True)
+        return True, None
+    except subprocess.CalledProcessError as e:
+        return False, e
+
+def check_chunks(chunks, chunk_paths, frame_duration):
+    # 检查各块实际时长与计划是否一致，偏差超过一帧说明边界处有缺口或重叠
+    issues = []
+    for (chunk_start, chunk_length), chunk_path in zip(chunks, chunk_paths):
+        actual = float(probe_streams(chunk_path)["format"]["duration"])
+        if abs(actual - chunk_length) > frame_duration:
+            issues.append(f"chunk at {chunk_start:.3f}s is {actual:.3f}s, expected {chunk_length:.3f}s")
+    return issues
+
+def check_av_sync(output_file, frame_duration):
+    # 拼接后比较视频与音频的总时长，偏差超过两帧视为不同步
+    streams = probe_streams(output_file)["streams"]
+    durations = {s["codec_type"]: float(s["duration"]) for s in streams if s.get("duration") not in (None, "N/A")}
+    if "video" in durations and "audio" in durations:
+        drift = durations["video"] - durations["audio"]
+        if abs(drift) > 2 * frame_duration:
+            return [f"video and audio differ by {drift:.3f}s"]
+    return []
+
+def get_frame_duration(video_stream):
+    # 优先使用 r_frame_rate，无效（如 "0/0"）时依次退回 avg_frame_rate 和 25 fps
+    for key in ("r_frame_rate", "avg_frame_rate"):
+        numerator, _, denominator = (video_stream.get(key) or "").partition('/')
+        try:
+            numerator, denominator = float(numerator), float(denominator or 1)
+        except ValueError:
+            continue
+        if numerator > 0 and denominator > 0:
+            return denominator / numerator
+    return 1 / 25
+
+# 视频编码参数中是否使用硬件编码器（例如 h264_nvenc、hevc_videotoolbox）
+def is_hardware_encoder(video_options):
+    hardware = {suffix for suffixes in HARDWARE_ENCODERS.values() for suffix in suffixes}
+    for option, value in zip(video_options, video_options[1:]):
+        if option in ('-c:v', '-vcodec', '-codec:v'):
+            return value.rpartition('_')[2] in hardware
+    return False
+
+def encode_chunked(input_file, output_file, video_options, start_time=0, workers=None, chunk_seconds=CHUNK_SECONDS,
+                   scene_threshold=None):
+    try:
+        info = probe_streams(input_file)
+        duration = float(info["format"]["duration"])
+        video_stream = next(s for s in info["streams"] if s["codec_type"] == "video")
+        frame_duration = get_frame_duration(video_stream)
+        cut_points = [t for t in get_chunk_cut_points(input_file, scene_threshold) if t > start_time]
+    except (subprocess.CalledProcessError, OSError, KeyError, ValueError, StopIteration, ImportError) as e:
+        return False, e
+    chunks = plan_chunks(cut_points, start_time, duration, chunk_seconds)
+
+    # 每个 ffmpeg 进程限制线程数，使所有块加起来正好占满 CPU；核数较少时也至少并行两块
+    cpu_count = os.cpu_count() or 1
+    workers = workers or max(1, min(len(chunks), max(2, cpu_count // CHUNK_THREADS)))
+    if is_hardware_encoder(video_options):
+        workers = min(workers, HARDWARE_CHUNK_WORKERS)
+    threads = max(1, cpu_count // workers)
+    print(f"Encoding {len(chunks)} chunks with {workers} workers x {threads} threads")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        chunk_paths = [os.path.join(temp_dir, f"chunk_{i:05d}.mkv") for i in range(len(chunks))]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda args: encode_chunk(input_file, args[0][0], args[0][1], video_options, threads, args[1]),
+                zip(chunks, chunk_paths)
+            ))
+        for success, error in results:
+            if not success:
+                return False, error
+
+        issues = check_chunks(chunks, chunk_paths, frame_duration)
+
+        # 视频流直接复制拼接，音频从源文件的同一时间段取
+        list_path = os.path.join(temp_dir, "chunks.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for chunk_path in chunk_paths:
+                f.write(f"file '{chunk_path}'\n")
+        command = ["ffmpeg", "-y", "-v", "error", "-nostdin", "-f", "concat", "-safe", "0", "-i", list_path]
+        if start_time > 0:
+            command += ["-ss", str(start_time)]
+        command += ["-i", input_file, "-map", "0:v:0", "-map", "1:a?", "-c:v", "copy", output_file]
+        try:
+            subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            return False, e
+
+    issues += check_av_sync(output_file, frame_duration)
+    for issue in issues:
+        print("Warning:", issue)
+    return True, issues
@@ -0,0 +1,43 @@
+# 滤镜链构建：把所有需要的滤镜组合成一条链，整个处理只解码一次、过滤一次
+# 变速、裁剪、降帧率和缩小排在前面，让去噪、去抖等昂贵滤镜处理更少的像素和帧；放大排在最后；不起作用的滤镜直接省略
+def build_filter_chain(source_size=None, setpts=None, crop=None, fps=None, scale=None, scale_flags=None,
+                       denoise=False, stabilize=False, extra=None):
+    stages = []
+    width, height = source_size if source_size else (None, None)
+
+    if setpts and setpts != 1:
+        stages.append(f"setpts={setpts}*PTS")
+
+    # 裁剪区域与画面相同时等于不裁剪
+    if crop:
+        crop_width, crop_height, crop_x, crop_y = crop
+        if (crop_width, crop_height) != (width, height):
+            stages.append(f"crop={crop_width}:{crop_height}:{crop_x}:{crop_y}")
+        width, height = crop_width, crop_height
+
+    if fps:
+        stages.append(f"fps={fps}")
+
+    # 缩放到当前尺寸等于不缩放；尺寸无法比较（表达式、-1 等）时按缩小处理
+    upscale = None
+    if scale:
+        scale_width, scale_height = scale
+        if (scale_width, scale_height) != (width, height):
+            scale_filter = f"scale={scale_width}:{scale_height}" + (f":flags={scale_flags}" if scale_flags else "")
+            sizes = (scale_width, scale_height, width, height)
+            if all(isinstance(v, int) and v > 0 for v in sizes) and scale_width * scale_height > width * height:
+                upscale = scale_filter
+            else:
+                stages.append(scale_filter)
+
+    if denoise:
+        stages.append("hqdn3d=1.5:1.5:6.0:6.0")
+    if stabilize:
+        stages.append("deshake")
+    if extra:
+        stages.extend(stage for stage in extra if stage)
+    if upscale:
+        stages.append(upscale)
+
+    return ",".join(stages)
+
@@ -0,0 +1,183 @@
+import subprocess
+import threading
+import tempfile
+import hashlib
+import struct
+import bisect
+import array
+import os
+
+from . import CACHE_DIR
+
+# 关键帧索引文件头：魔数、版本、源文件大小、源文件修改时间、关键帧数、数据包数、是否为开放 GOP、容器起始时间
+INDEX_HEADER = struct.Struct('<4sIqqIIId')
+INDEX_MAGIC = b'VEKI'
+INDEX_VERSION = 4
+
+# 同一进程内的多个线程（例如并行剪切）对同一文件建立索引时，只让一个线程扫描
+index_locks = {}
+index_locks_guard = threading.Lock()
+
+def get_index_lock(video_path):
+    with index_locks_guard:
+        return index_locks.setdefault(os.path.abspath(video_path), threading.Lock())
+
+# 关键帧索引的缓存路径，以源文件的绝对路径区分
+def get_index_path(video_path):
+    digest = hashlib.sha1(os.path.abspath(video_path).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, 'index', f'{digest}.idx')
+
+# 容器的起始时间（format.start_time，即各条流起始时间的最小值），输入端 -ss 从这里开始计时
+def get_start_time(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=start_time', '-of', 'csv=p=0', video_path],
+        capture_output=True, text=True, check=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+# 用一次 ffprobe 数据包扫描建立关键帧索引，并写入缓存目录
+def build_keyframe_index(video_path):
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,size,pos,flags', '-of', 'compact=p=0:nk=0', video_path
+    ]
+    stat = os.stat(video_path)
+    start_time = get_start_time(video_path)
+    keyframes = []
+    packet_sizes = array.array('I')
+    # 解码顺序中关键帧之后出现显示时间更早的帧，说明是开放 GOP（前置帧参考上一个 GOP）
+    open_gop = False
+    last_key_time = None
+
+    # 逐行读取 ffprobe 输出，避免把整个输出读入内存
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as process:
+        for line in process.stdout:
+            fields = dict(item.split('=', 1) for item in line.strip().split('|') if '=' in item)
+            size = fields.get('size', 'N/A')
+            packet_sizes.append(int(size) if size.isdigit() else 0)
+            if fields.get('pts_time', 'N/A') == 'N/A':
+                continue
+            pts_time = float(fields['pts_time'])
+            if 'K' in fields.get('flags', ''):
+                pos = fields.get('pos', 'N/A')
+                keyframes.append((pts_time, int(pos) if pos.isdigit() else -1, len(packet_sizes) - 1))
+                last_key_time = pts_time
+            elif last_key_time is not None and pts_time < last_key_time:
+                open_gop = True
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    # 数据包按解码顺序输出，按显示时间排序后才能二分查找
+    keyframes.sort()
+    keyframe_times = array.array('d', (keyframe[0] for keyframe in keyframes))
+    keyframe_offsets = array.array('q', (keyframe[1] for keyframe in keyframes))
+    keyframe_packets = array.array('I', (keyframe[2] for keyframe in keyframes))
+
+    # 写入同目录下的唯一临时文件后原子地替换，并发写入互不干扰
+    index_path = get_index_path(video_path)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(keyframe_times), len(packet_sizes),
+                open_gop, start_time
+            ))
+            keyframe_times.tofile(f)
+            keyframe_offsets.tofile(f)
+            keyframe_packets.tofile(f)
+            packet_sizes.tofile(f)
+        os.replace(temp_path, index_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        'keyframe_times': keyframe_times,
+        'keyframe_offsets': keyframe_offsets,
+        'keyframe_packets': keyframe_packets,
+        'packet_sizes': packet_sizes,
+        'open_gop': open_gop,
+        'start_time': start_time
+    }
+
+def read_keyframe_index(video_path):
+    stat = os.stat(video_path)
+    try:
+        with open(get_index_path(video_path), 'rb') as f:
+            magic, version, size, mtime_ns, keyframe_count, packet_count, open_gop, start_time = INDEX_HEADER.unpack(
+                f.read(INDEX_HEADER.size)
+            )
+            if (magic, version, size, mtime_ns) != (INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+                return None
+            index = {
+                'keyframe_times': array.array('d'),
+                'keyframe_offsets': array.array('q'),
+                'keyframe_packets': array.array('I'),
+                'packet_sizes': array.array('I'),
+                'open_gop': bool(open_gop),
+                'start_time': start_time
+            }
+            index['keyframe_times'].fromfile(f, keyframe_count)
+            index['keyframe_offsets'].fromfile(f, keyframe_count)
+            index['keyframe_packets'].fromfile(f, keyframe_count)
+            index['packet_sizes'].fromfile(f, packet_count)
+            return index
+    except (OSError, EOFError, struct.error):
+        return None
+
+# 读取关键帧索引；缓存不存在或源文件（大小、修改时间）已变化时重新建立
+def load_keyframe_index(video_path):
+    with get_index_lock(video_path):
+        index = read_keyframe_index(video_path)
+        if index is None:
+            index = build_keyframe_index(video_path)
+        return index
+
+# 查找不晚于 t 的最近关键帧（O(log n)），返回其在索引中的序号，没有则返回 None
+def find_keyframe_before(index, t):
+    i = bisect.bisect_right(index['keyframe_times'], t) - 1
+    return i if i >= 0 else None
+
+# 查找不早于 t 的最近关键帧，返回其在索引中的序号，没有则返回 None
+def find_keyframe_after(index, t):
+    i = bisect.bisect_left(index['keyframe_times'], t)
+    return i if i < len(index['keyframe_times']) else None
+
+# 计算两个关键帧之间（可直接复制码流的区间）的数据量，单位字节
+def get_copy_range_bytes(index, first_key, last_key):
+    first_packet = index['keyframe_packets'][first_key]
+    last_packet = index['keyframe_packets'][last_key]
+    return sum(index['packet_sizes'][first_packet:last_packet])
+
+# 输入端 -ss 的定位点（相对时间）：有关键帧索引时取起点之前最近的关键帧，否则就是起点本身
+# 只有 build_index=True（例如流复制剪切）才会在没有索引时扫描整个文件建立索引，普通剪切只使用已有的索引
+def get_seek_point(video_path, start_seconds, build_index=False):
+    if start_seconds <= 0:
+        return 0.0
+    try:
+        index = load_keyframe_index(video_path) if build_index else read_keyframe_index(video_path)
+    except (OSError, subprocess.CalledProcessError):
+        index = None
+    if index is None or not index['keyframe_times']:
+        # 没有索引时交给 ffmpeg 在输入端定位（重新编码时 ffmpeg 会解码到精确的起点）
+        return start_seconds
+    # 关键帧时间是绝对时间戳，以容器起始时间为零点换算成输入端 -ss 的相对时间
+    origin = index['start_time']
+    key = find_keyframe_before(index, origin + start_seconds)
+    return max(0.0, index['keyframe_times'][key] - origin) if key is not None else 0.0
+
+# 定位规划：输入端 -ss 粗定位到定位点，输出端 -ss 补上到起点的剩余部分；返回 (输入选项, 输出选项)
+def plan_seek(video_path, start_seconds=0, end_seconds=None, build_index=False):
+    coarse = get_seek_point(video_path, start_seconds, build_index)
+    input_options = ['-ss', f'{coarse:.6f}'] if coarse > 0 else []
+    # 输入端 -t 让 ffmpeg 读到终点就停止
+    if end_seconds is not None:
+        input_options += ['-t', f'{end_seconds - coarse:.6f}']
+    fine = start_seconds - coarse
+    output_options = ['-ss', f'{fine:.6f}'] if fine > 0 else []
+    return input_options, output_options
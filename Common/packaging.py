@@ -0,0 +1,49 @@
+import os
+
+# 各打包格式可以直接容纳的编码，其余的流需要重新编码
+PACKAGE_CODECS = {
+    'hls_ts': {'video': {'h264', 'hevc'}, 'audio': {'aac', 'mp3', 'ac3', 'eac3'}},
+    'hls_fmp4': {'video': {'h264', 'hevc', 'av1'}, 'audio': {'aac', 'ac3', 'eac3', 'alac', 'flac', 'opus'}},
+    'dash': {'video': {'h264', 'hevc', 'av1', 'vp9'}, 'audio': {'aac', 'ac3', 'eac3', 'flac', 'opus'}}
+}
+SEGMENT_SECONDS = 4
+
+def get_package_type(package_format, segment_type='fmp4'):
+    return 'dash' if package_format == 'dash' else f'hls_{segment_type}'
+
+# 切片输出的复用器参数（最后一项是清单路径），variants 为 HLS 的 var_stream_map 条目
+# 切片随编码产生即写出：HLS 使用 event 播放列表和 temp_file，DASH 使用 streaming 模式，下游可以边生成边上传
+def build_package_options(output_dir, package_format='hls', segment_type='fmp4', segment_seconds=SEGMENT_SECONDS,
+                          variants=None, has_audio=True, event=True):
+    if package_format == 'dash':
+        options = [
+            "-f", "dash", "-seg_duration", str(segment_seconds), "-use_template", "1", "-use_timeline", "1",
+            "-adaptation_sets", "id=0,streams=v id=1,streams=a" if has_audio else "id=0,streams=v",
+            "-init_seg_name", "init_$RepresentationID$.m4s",
+            "-media_seg_name", "chunk_$RepresentationID$_$Number%05d$.m4s"
+        ]
+        if event:
+            options += ["-streaming", "1", "-window_size", "0"]
+        options.append(os.path.join(output_dir, "manifest.mpd"))
+        return options
+
+    # 每个版本一个子目录；temp_file 保证上传程序只会看到写完的切片
+    segment_extension = 'm4s' if segment_type == 'fmp4' else 'ts'
+    options = [
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_list_size", "0",
+        "-hls_segment_type", "fmp4" if segment_type == 'fmp4' else "mpegts",
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", os.path.join(output_dir, "%v", f"segment_%05d.{segment_extension}"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", " ".join(variants)
+    ]
+    if segment_type == 'fmp4':
+        options += ["-hls_fmp4_init_filename", "init.mp4"]
+    # event 播放列表在编码过程中持续追加
+    options += ["-hls_playlist_type", "event" if event else "vod"]
+    options.append(os.path.join(output_dir, "%v", "index.m3u8"))
+    return options
+
+# 清单文件的路径，用于提示
+def get_manifest_path(output_dir, package_format='hls'):
+    return os.path.join(output_dir, "manifest.mpd" if package_format == 'dash' else "master.m3u8")
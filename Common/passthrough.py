@@ -0,0 +1,91 @@
+import subprocess
+import shutil
+import os
+import re
+
+# 直通判断：源文件已经满足要求时改为流复制、换封装或直接跳过，避免无意义的重新编码
+# 各封装格式可以直接容纳的视频编码（None 表示不限制），不在其中的视频流只能重新编码
+CONTAINER_VIDEO_CODECS = {
+    'mp4': {'h264', 'hevc', 'av1', 'vp9', 'mpeg4', 'mpeg2video'},
+    'mov': {'h264', 'hevc', 'prores', 'mpeg4', 'mjpeg'},
+    'webm': {'vp8', 'vp9', 'av1'},
+    'mkv': None
+}
+# 各封装格式可以直接容纳的音频编码（None 表示不限制）
+CONTAINER_AUDIO_CODECS = {
+    'mp4': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'flac', 'opus'},
+    'mov': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    'webm': {'opus', 'vorbis'},
+    'mkv': None
+}
+
+def parse_bitrate(bitrate):
+    # 把 "2M"、"800k" 这样的码率转换为 bps
+    match = re.fullmatch(r"([\d.]+)\s*([kKmMgG]?)", str(bitrate).strip())
+    if not match:
+        raise ValueError(f"invalid bitrate: {bitrate}")
+    return float(match.group(1)) * {'': 1, 'k': 1e3, 'm': 1e6, 'g': 1e9}[match.group(2).lower()]
+
+# require_rate_control=True 用于压缩：没有指定码率时，重新编码本身就是目的，不能跳过
+def plan_passthrough(info, input_file, output_file, codec=None, pix_fmt=None, frame_rate=None, bitrate=None,
+                     filter_chain=None, start_time=0, require_rate_control=False):
+    # 返回 (方式, 原因)，方式为 encode / copy / remux / skip
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        return 'encode', 'no video stream found'
+    if filter_chain:
+        return 'encode', f'filters requested: {filter_chain}'
+    if start_time:
+        return 'encode', 'trimming needs a re-encode'
+    if require_rate_control and not bitrate:
+        return 'encode', 'no bitrate given, re-encoding with the encoder defaults'
+    if codec and video.get("codec_name") != codec:
+        return 'encode', f'codec is {video.get("codec_name")}, requested {codec}'
+    if pix_fmt and video.get("pix_fmt") != pix_fmt:
+        return 'encode', f'pixel format is {video.get("pix_fmt")}, requested {pix_fmt}'
+    if frame_rate:
+        numerator, _, denominator = str(video.get("r_frame_rate", "0/1")).partition('/')
+        source_rate = float(numerator) / float(denominator or 1) if float(denominator or 1) else 0
+        if abs(source_rate - float(frame_rate)) > 0.01:
+            return 'encode', f'frame rate is {source_rate:.3f}, requested {frame_rate}'
+    if bitrate:
+        # 视频流没有码率时用整体码率，偏保守
+        source_bitrate = str(video.get("bit_rate") or info.get("format", {}).get("bit_rate", ""))
+        if not source_bitrate.isdigit():
+            return 'encode', 'source bitrate is unknown'
+        if int(source_bitrate) > parse_bitrate(bitrate):
+            return 'encode', f'bitrate is {int(source_bitrate) // 1000}k, requested {bitrate}'
+
+    input_ext = os.path.splitext(input_file)[1].lower().lstrip('.')
+    output_ext = os.path.splitext(output_file)[1].lower().lstrip('.')
+    allowed_video = CONTAINER_VIDEO_CODECS.get(output_ext)
+    if allowed_video is not None and video.get("codec_name") not in allowed_video:
+        return 'encode', f'{video.get("codec_name")} video cannot be stored in {output_ext}'
+    if input_ext == output_ext:
+        return 'skip', 'source already matches the request'
+    allowed = CONTAINER_AUDIO_CODECS.get(output_ext)
+    audio_codecs = {s.get("codec_name") for s in streams if s.get("codec_type") == "audio"}
+    if allowed is None or audio_codecs <= allowed:
+        return 'remux', f'only the container changes ({input_ext} -> {output_ext})'
+    return 'copy', f'video is copied, {", ".join(sorted(audio_codecs - allowed))} audio is re-encoded for {output_ext}'
+
+def run_passthrough(plan, input_file, output_file):
+    if plan == 'skip':
+        # 不调用 ffmpeg；输出路径与源文件不同时直接复制文件
+        if os.path.abspath(input_file) != os.path.abspath(output_file):
+            shutil.copyfile(input_file, output_file)
+        return
+    codec_options = ["-c", "copy"] if plan == 'remux' else ["-c:v", "copy"]
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", input_file, "-map", "0:v", "-map", "0:a?"] + codec_options +
+            [output_file],
+            check=True
+        )
+    except subprocess.CalledProcessError:
+        # 删除写了一半的输出，调用方可以直接退回重新编码
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+
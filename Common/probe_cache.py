@@ -0,0 +1,105 @@
+import subprocess
+import threading
+import sqlite3
+import json
+import time
+import os
+
+from . import CACHE_DIR
+
+# 探测缓存：以 (路径, 大小, 修改时间, inode) 判断是否失效
+# 数据库实际占用超过 PROBE_CACHE_MAX_BYTES 字节时，按最近使用时间淘汰记录，直到降到上限的 90% 以下
+PROBE_CACHE_PATH = os.path.join(CACHE_DIR, 'probe_cache.sqlite3')
+PROBE_CACHE_MAX_BYTES = 64 * 1024 ** 2
+PROBE_ENTRIES = (
+    "format=duration,size,bit_rate,format_name:"
+    "stream=index,codec_type,codec_name,width,height,pix_fmt,bits_per_raw_sample,"
+    "avg_frame_rate,r_frame_rate,bit_rate,sample_rate,channels,channel_layout"
+)
+probe_cache_connection = None
+# 连接在线程间共享，读写都在锁内进行，避免事务交错
+probe_cache_lock = threading.Lock()
+
+def open_probe_cache():
+    global probe_cache_connection
+    if probe_cache_connection is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        connection = sqlite3.connect(PROBE_CACHE_PATH, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, data TEXT, last_access REAL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS probes_last_access ON probes (last_access)")
+        probe_cache_connection = connection
+    return probe_cache_connection
+
+# 查找缓存中仍然有效的探测结果，没有或缓存不可用时返回 None
+def lookup_probe_cache(path, stat):
+    try:
+        with probe_cache_lock:
+            connection = open_probe_cache()
+            with connection:
+                row = connection.execute(
+                    "SELECT size, mtime_ns, inode, data FROM probes WHERE path = ?", (path,)
+                ).fetchone()
+                if row and row[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                    connection.execute("UPDATE probes SET last_access = ? WHERE path = ?", (time.time(), path))
+                    return json.loads(row[3])
+    except (sqlite3.Error, OSError, ValueError):
+        # 缓存损坏、被锁或目录不可写时当作未命中，由调用方直接探测
+        return None
+    return None
+
+# 数据库已使用的字节数（不含空闲页），读取开销与记录数无关
+def get_probe_cache_bytes(connection):
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    return (page_count - freelist_count) * page_size
+
+# 保存探测结果，超过字节上限时淘汰最久未使用的记录；缓存不可用时直接跳过
+def store_probe_cache(path, stat, data):
+    try:
+        with probe_cache_lock:
+            connection = open_probe_cache()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, json.dumps(data), time.time())
+                )
+                used_bytes = get_probe_cache_bytes(connection)
+                if used_bytes > PROBE_CACHE_MAX_BYTES:
+                    # 从最近使用的记录开始累加数据长度，超出保留额度的记录全部删除
+                    keep_bytes = int(PROBE_CACHE_MAX_BYTES * 0.9)
+                    data_bytes = connection.execute(
+                        "SELECT COALESCE(SUM(LENGTH(CAST(data AS BLOB))), 0) FROM probes"
+                    ).fetchone()[0]
+                    # 按数据占比折算，扣除索引和页内空闲等开销
+                    keep_bytes = keep_bytes * data_bytes // used_bytes
+                    connection.execute(
+                        "DELETE FROM probes WHERE path IN (SELECT path FROM ("
+                        "SELECT path, SUM(LENGTH(CAST(data AS BLOB))) OVER "
+                        "(ORDER BY last_access DESC, path ROWS UNBOUNDED PRECEDING) AS total FROM probes"
+                        ") WHERE total > ?)",
+                        (keep_bytes,)
+                    )
+    except (sqlite3.Error, OSError):
+        pass
+
+# 获取 ffprobe 的 JSON 探测结果，优先使用缓存；缓存不可用时直接调用 ffprobe
+def probe_cached(file_path):
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    data = lookup_probe_cache(path, stat)
+    if data is not None:
+        return data
+
+    # 缓存未命中或文件已变化，重新探测
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", PROBE_ENTRIES, "-of", "json", path],
+        capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout)
+    store_probe_cache(path, stat, data)
+    return data
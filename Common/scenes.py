@@ -0,0 +1,91 @@
+import subprocess
+import json
+
+# 获取视频帧率（用于换算 EDL 时间码中的帧和场景检测的采样）
+def parse_rate(rate):
+    # 解析 "30000/1001" 形式的帧率，无效值（如 "0/0"）返回 0
+    numerator, _, denominator = (rate or '').partition('/')
+    try:
+        numerator, denominator = float(numerator), float(denominator or 1)
+    except ValueError:
+        return 0.0
+    return numerator / denominator if numerator > 0 and denominator > 0 else 0.0
+
+# 时间码按标称帧率 r_frame_rate 计算；average=True 时使用平均帧率 avg_frame_rate，适合可变帧率视频的采样
+def get_frame_rate(video_path, average=False):
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=r_frame_rate,avg_frame_rate', '-of', 'json', video_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get('streams') or [{}]
+    keys = ('avg_frame_rate', 'r_frame_rate') if average else ('r_frame_rate', 'avg_frame_rate')
+    for key in keys:
+        frame_rate = parse_rate(streams[0].get(key))
+        if frame_rate:
+            return frame_rate
+    raise ValueError(f"Unknown frame rate: {video_path}")
+
+# 从管道中读满 buffer，返回实际读到的字节数（文件结束时可能不足）
+def read_into_buffer(stream, buffer):
+    view = memoryview(buffer).cast('B')
+    total = 0
+    while total < len(view):
+        count = stream.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+# 场景切换检测：以缩小的灰度帧分块读取，计算帧差和直方图差，返回场景边界时间（秒）
+def detect_scenes(video_path, threshold=0.3, min_scene_length=1.0, width=160, height=90, chunk_frames=256):
+    import numpy as np
+
+    frame_rate = get_frame_rate(video_path, average=True)
+    command = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-i', video_path, '-an', '-sn',
+        '-vf', f'fps={frame_rate:.6f},scale={width}:{height}:flags=fast_bilinear,format=gray',
+        '-f', 'rawvideo', '-pix_fmt', 'gray', '-'
+    ]
+
+    # 固定大小的缓冲区，多出的一帧用于保存上一块的最后一帧，内存占用与视频长度无关
+    frames = np.empty((chunk_frames + 1, height, width), dtype=np.uint8)
+    bins = 16
+    bin_offsets = (np.arange(chunk_frames + 1) * bins)[:, None]
+    boundaries = []
+    frame_index = 0
+    last_boundary = 0.0
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        while True:
+            count = read_into_buffer(process.stdout, frames[1:]) // (width * height)
+            if count == 0:
+                break
+            # 第一块没有上一帧，从第二帧开始比较
+            first = 0 if frame_index > 0 else 1
+            current = frames[first:count + 1]
+
+            # 平均像素差（0~1）
+            diff = np.abs(np.diff(current.astype(np.int16), axis=0)).mean(axis=(1, 2)) / 255.0
+
+            # 亮度直方图差（0~1）
+            indices = (current.reshape(len(current), -1) >> 4) + bin_offsets[:len(current)]
+            histograms = np.bincount(indices.ravel(), minlength=len(current) * bins).reshape(len(current), bins)
+            histograms = histograms / float(width * height)
+            hist_diff = np.abs(np.diff(histograms, axis=0)).sum(axis=1) / 2.0
+
+            # 综合得分超过阈值且距离上一个边界足够远时，记为场景边界
+            scores = (diff + hist_diff) / 2.0
+            for i in np.flatnonzero(scores >= threshold):
+                time = float(frame_index + i + first) / frame_rate
+                if time - last_boundary >= min_scene_length:
+                    boundaries.append(time)
+                    last_boundary = time
+
+            frame_index += count
+            # 保留最后一帧给下一块比较
+            frames[0] = frames[count]
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    return boundaries
@@ -1,115 +1,18 @@
 import wx
 import re
-import platform
 import subprocess
+import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.capabilities import auto_encode
+from Common.filters import build_filter_chain
 
 def is_decimal_format(s: str) -> bool:
     pattern = r"^0\.0*[1-9]\d*$"
     return bool(re.match(pattern, s))
 
-def auto_encode(selected_codec):
-    # 检测可用的硬件加速单元
-    system_platform = platform.system()
-    h264_support = []
-    hevc_support = []
-    vp8_support = []
-    vp9_support = []
-    av1_support = []
-    prores_support = []
-
-    # 运行FFmpeg命令以列出可用的编码器
-    ffmpeg_output = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True)
-    # 根据平台检查可用的编码器
-    if system_platform in ['Windows', 'Linux']:
-
-        # 检查NVIDIA NVENC支持
-        if "h264_nvenc" in ffmpeg_output.stdout:
-            h264_support.append('nvenc')
-        if "hevc_nvenc" in ffmpeg_output.stdout:
-            hevc_support.append('nvenc')
-        if "av1_nvenc" in ffmpeg_output.stdout:
-            av1_support.append('nvenc')
-        if "prores_nvenc" in ffmpeg_output.stdout:
-            prores_support.append('nvenc')
-        if "vp8_nvenc" in ffmpeg_output.stdout:
-            vp8_support.append('nvenc')
-        if "vp9_nvenc" in ffmpeg_output.stdout:
-            vp9_support.append('nvenc')
-
-        # 检查Intel QSV支持
-        if "h264_qsv" in ffmpeg_output.stdout:
-            h264_support.append('qsv')
-        if "hevc_qsv" in ffmpeg_output.stdout:
-            hevc_support.append('qsv')
-        if "av1_qsv" in ffmpeg_output.stdout:
-            av1_support.append('qsv')
-        if "prores_qsv" in ffmpeg_output.stdout:
-            prores_support.append('qsv')
-        if "vp8_qsv" in ffmpeg_output.stdout:
-            vp8_support.append('qsv')
-        if "vp9_qsv" in ffmpeg_output.stdout:
-            vp9_support.append('qsv')
-
-        # 检查AMD AMF支持
-        if "h264_amf" in ffmpeg_output.stdout:
-            h264_support.append('amf')
-        if "hevc_amf" in ffmpeg_output.stdout:
-            hevc_support.append('amf')
-        if "av1_amf" in ffmpeg_output.stdout:
-            av1_support.append('amf')
-        if "prores_amf" in ffmpeg_output.stdout:
-            prores_support.append('amf')
-        if "vp8_amf" in ffmpeg_output.stdout:
-            vp8_support.append('amf')
-        if "vp9_amf" in ffmpeg_output.stdout:
-            vp9_support.append('amf')
-
-    elif system_platform == 'Darwin':  # macOS 平台
-        if "h264_videotoolbox" in ffmpeg_output.stdout:
-            h264_support.append('videotoolbox')
-        if "hevc_videotoolbox" in ffmpeg_output.stdout:
-            hevc_support.append('videotoolbox')
-        if 'prores_videotoolbox' in ffmpeg_output.stdout:
-            prores_support.append('videotoolbox')
-        if 'av1_videotoolbox' in ffmpeg_output.stdout:
-            av1_support.append('videotoolbox')
-        if 'vp8_videotoolbox' in ffmpeg_output.stdout:
-            vp8_support.append('videotoolbox')
-        if 'vp9_videotoolbox' in ffmpeg_output.stdout:
-            vp9_support.append('videotoolbox')
-
-    if selected_codec == 'h264':
-        if h264_support:
-            return h264_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'hevc':
-        if hevc_support:
-            return hevc_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'av1':
-        if av1_support:
-            return av1_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'prores':
-        if prores_support:
-            return prores_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp8':
-        if vp8_support:
-            return vp8_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp9':
-        if vp9_support:
-            return vp9_support[0]
-        else:
-            return 'cpu'
-    else:
-        return 'cpu'
 
 def get_video_info(video_path):
     # 使用 ffprobe 命令来获取视频的详细信息
@@ -159,12 +62,17 @@ def compress_video(input_file, output_file, scale_factor=None, bitrate=None, cod
     # 基础 FFmpeg 命令
     command = ["ffmpeg", "-i", input_file]
 
-    # 获取原始分辨率
+    # 缩放、帧率、去噪和去抖合并为一条滤镜链；只有缩放时才需要原始分辨率
+    source_size, scale = None, None
     if scale_factor:
-        width, height = video_info["width"], video_info["height"]
-        new_width = int(width * scale_factor)
-        new_height = int(height * scale_factor)
-        command += ["-vf", f"scale={new_width}:{new_height}"]
+        source_size = (video_info["width"], video_info["height"])
+        # 保持偶数尺寸，满足 yuv420 编码的要求
+        scale = tuple(int(size * float(scale_factor)) // 2 * 2 for size in source_size)
+    filter_chain = build_filter_chain(
+        source_size=source_size, fps=frame_rate, scale=scale, denoise=denoise, stabilize=stabilize
+    )
+    if filter_chain:
+        command += ["-vf", filter_chain]
 
     # 设置码率
     if bitrate:
@@ -178,10 +86,6 @@ def compress_video(input_file, output_file, scale_factor=None, bitrate=None, cod
         else:
             command += ["-c:v", codec]
 
-    # 设置帧率
-    if frame_rate:
-        command += ["-r", str(frame_rate)]
-
     # 设置色深和色彩空间
     if color_depth or color_space:
         if color_depth and color_space:
@@ -192,12 +96,6 @@ def compress_video(input_file, output_file, scale_factor=None, bitrate=None, cod
             else:
                 command += ["-pix_fmt", f"yuv{color_space.replace(':', '')}p{video_info['color_depth']}le"]
 
-    # 添加去噪和去抖
-    if denoise:
-        command += ["-vf", "hqdn3d=1.5:1.5:6.0:6.0"]
-    if stabilize:
-        command += ["-vf", "deshake"]
-
     # 输出文件设置
     command += [output_file]
 
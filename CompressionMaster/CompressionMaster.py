@@ -1,130 +1,36 @@
 import re
-import platform
 import subprocess
-
-def auto_encode(selected_codec):
-    # 检测可用的硬件加速单元
-    system_platform = platform.system()
-    h264_support = []
-    hevc_support = []
-    vp8_support = []
-    vp9_support = []
-    av1_support = []
-    prores_support = []
-
-    # 运行FFmpeg命令以列出可用的编码器
-    ffmpeg_output = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True)
-    # 根据平台检查可用的编码器
-    if system_platform in ['Windows', 'Linux']:
-
-        # 检查NVIDIA NVENC支持
-        if "h264_nvenc" in ffmpeg_output.stdout:
-            h264_support.append('nvenc')
-        if "hevc_nvenc" in ffmpeg_output.stdout:
-            hevc_support.append('nvenc')
-        if "av1_nvenc" in ffmpeg_output.stdout:
-            av1_support.append('nvenc')
-        if "prores_nvenc" in ffmpeg_output.stdout:
-            prores_support.append('nvenc')
-        if "vp8_nvenc" in ffmpeg_output.stdout:
-            vp8_support.append('nvenc')
-        if "vp9_nvenc" in ffmpeg_output.stdout:
-            vp9_support.append('nvenc')
-
-        # 检查Intel QSV支持
-        if "h264_qsv" in ffmpeg_output.stdout:
-            h264_support.append('qsv')
-        if "hevc_qsv" in ffmpeg_output.stdout:
-            hevc_support.append('qsv')
-        if "av1_qsv" in ffmpeg_output.stdout:
-            av1_support.append('qsv')
-        if "prores_qsv" in ffmpeg_output.stdout:
-            prores_support.append('qsv')
-        if "vp8_qsv" in ffmpeg_output.stdout:
-            vp8_support.append('qsv')
-        if "vp9_qsv" in ffmpeg_output.stdout:
-            vp9_support.append('qsv')
-
-        # 检查AMD AMF支持
-        if "h264_amf" in ffmpeg_output.stdout:
-            h264_support.append('amf')
-        if "hevc_amf" in ffmpeg_output.stdout:
-            hevc_support.append('amf')
-        if "av1_amf" in ffmpeg_output.stdout:
-            av1_support.append('amf')
-        if "prores_amf" in ffmpeg_output.stdout:
-            prores_support.append('amf')
-        if "vp8_amf" in ffmpeg_output.stdout:
-            vp8_support.append('amf')
-        if "vp9_amf" in ffmpeg_output.stdout:
-            vp9_support.append('amf')
-
-    elif system_platform == 'Darwin':  # macOS 平台
-        if "h264_videotoolbox" in ffmpeg_output.stdout:
-            h264_support.append('videotoolbox')
-        if "hevc_videotoolbox" in ffmpeg_output.stdout:
-            hevc_support.append('videotoolbox')
-        if 'prores_videotoolbox' in ffmpeg_output.stdout:
-            prores_support.append('videotoolbox')
-        if 'av1_videotoolbox' in ffmpeg_output.stdout:
-            av1_support.append('videotoolbox')
-        if 'vp8_videotoolbox' in ffmpeg_output.stdout:
-            vp8_support.append('videotoolbox')
-        if 'vp9_videotoolbox' in ffmpeg_output.stdout:
-            vp9_support.append('videotoolbox')
-
-    if selected_codec == 'h264':
-        if h264_support:
-            return h264_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'hevc':
-        if hevc_support:
-            return hevc_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'av1':
-        if av1_support:
-            return av1_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'prores':
-        if prores_support:
-            return prores_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp8':
-        if vp8_support:
-            return vp8_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp9':
-        if vp9_support:
-            return vp9_support[0]
-        else:
-            return 'cpu'
-    else:
-        return 'cpu'
+import json
+import os
+import tempfile
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common import CACHE_DIR
+from Common.probe_cache import probe_cached
+from Common.capabilities import get_capabilities, auto_encode
+from Common.chunking import encode_chunked, get_frame_duration
+from Common.filters import build_filter_chain
+from Common.passthrough import parse_bitrate, plan_passthrough, run_passthrough
+from Common.packaging import (
+    PACKAGE_CODECS, SEGMENT_SECONDS, get_package_type, build_package_options, get_manifest_path
+)
 
 def get_video_info(video_path):
-    # 使用 ffprobe 命令来获取视频的详细信息
-    command = [
-        "ffprobe", "-v", "error", "-select_streams", "v:0",
-        "-show_entries", "stream=width,height,bit_rate,codec_name,pix_fmt",
-        "-of", "default=noprint_wrappers=1", video_path
-    ]
-
     try:
-        # 运行命令并捕获输出
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        output = result.stdout
+        # 从探测缓存中获取第一条视频流
+        streams = probe_cached(video_path).get("streams", [])
+        stream = next(stream for stream in streams if stream.get("codec_type") == "video")
 
         # 提取码率、分辨率、编码格式、色彩位深和色彩空间
-        width = int(re.search(r"width=(\d+)", output).group(1))
-        height = int(re.search(r"height=(\d+)", output).group(1))
-        bitrate = int(re.search(r"bit_rate=(\d+)", output).group(1)) if re.search(r"bit_rate=(\d+)", output) else None
-        codec = re.search(r"codec_name=([\w\d]+)", output).group(1)
-        pix_fmt = re.search(r"pix_fmt=([\w\d]+)", output).group(1)
+        width = int(stream["width"])
+        height = int(stream["height"])
+        bitrate = int(stream["bit_rate"]) if str(stream.get("bit_rate", "")).isdigit() else None
+        codec = stream.get("codec_name")
+        pix_fmt = stream.get("pix_fmt", "")
 
         # 解析色彩位深和色彩空间
         color_depth_match = re.search(r"yuv(\d+)p(\d+)", pix_fmt)
@@ -132,6 +38,8 @@ def get_video_info(video_path):
         color_space = f"{color_depth_match.group(2)[0]}:{color_depth_match.group(2)[1]}" if color_depth_match else "unknown"
 
         return {
+            "width": width,
+            "height": height,
             "resolution": f"{width}x{height}",
             "bitrate": bitrate,
             "codec": codec,
@@ -139,23 +47,241 @@ def get_video_info(video_path):
             "color_space": color_space
         }
 
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError, StopIteration, KeyError, ValueError) as e:
         print("Cannot get video info:", e)
         return None
 
+# 目标大小模式使用的软件编码器（硬件编码器不支持真正的两遍编码）
+TWO_PASS_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265', 'av1': 'libaom-av1'}
+# 预留给封装开销的比例
+MUX_OVERHEAD = 0.01
+# 探测不到音频码率时按此估算 (bps)
+DEFAULT_AUDIO_BITRATE = 128000
+
+def get_video_bitrate_for_size(video_path, target_bytes):
+    # 从探测缓存中读取时长和音频码率，计算达到目标大小所需的视频码率
+    # 第二遍只输出第一条音频流（见 build_pass_command），因此只扣除这一条的码率
+    data = probe_cached(video_path)
+    duration = float(data["format"]["duration"])
+    audio_bitrate = 0
+    audio = next((stream for stream in data.get("streams", []) if stream.get("codec_type") == "audio"), None)
+    if audio is not None:
+        bit_rate = str(audio.get("bit_rate", ""))
+        audio_bitrate = int(bit_rate) if bit_rate.isdigit() else DEFAULT_AUDIO_BITRATE
+
+    total_bitrate = target_bytes * 8 * (1 - MUX_OVERHEAD) / duration
+    video_bitrate = int(total_bitrate - audio_bitrate)
+    if video_bitrate <= 0:
+        raise ValueError(f"target size is too small for {duration:.1f}s with {audio_bitrate // 1000}k audio")
+    return video_bitrate, duration
+
+def build_pass_command(input_file, options, encoder, video_bitrate, pass_number, log_prefix, output):
+    command = ["ffmpeg", "-y", "-i", input_file, "-map", "0:v:0"] + options
+    command += ["-c:v", encoder, "-b:v", str(video_bitrate)]
+    if encoder == 'libx265':
+        # libx265 不读取 -pass，需要通过 x265-params 传入
+        command += ["-x265-params", f"pass={pass_number}:stats={log_prefix}.log"]
+    else:
+        command += ["-pass", str(pass_number), "-passlogfile", log_prefix]
+
+    if pass_number == 1:
+        # 第一遍只需要统计信息，不输出音频和文件
+        command += ["-an", "-f", "null", os.devnull]
+    else:
+        # 只复制第一条音频流，保证占用的码率与计算时一致
+        command += ["-map", "0:a:0?", "-c:a", "copy", output]
+    return command
+
+def compress_to_target_size(input_file, output_file, target_size, codec, options, tolerance=0.02):
+    # target_size 单位为 MB
+    target_bytes = int(target_size * 1024 * 1024)
+    encoder = TWO_PASS_ENCODERS.get(codec, 'libx264')
+    video_bitrate, duration = get_video_bitrate_for_size(input_file, target_bytes)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_prefix = os.path.join(temp_dir, "pass")
+        subprocess.run(build_pass_command(input_file, options, encoder, video_bitrate, 1, log_prefix, None), check=True)
+        subprocess.run(build_pass_command(input_file, options, encoder, video_bitrate, 2, log_prefix, output_file), check=True)
+
+        # 超出容差时把偏差折算到视频码率上，复用第一遍的统计信息再做一次第二遍
+        actual_bytes = os.path.getsize(output_file)
+        if abs(actual_bytes - target_bytes) > target_bytes * tolerance:
+            print(f"Output is {actual_bytes / 1024 / 1024:.2f}MB, correcting bitrate")
+            video_bitrate = int(video_bitrate + (target_bytes - actual_bytes) * 8 / duration)
+            subprocess.run(build_pass_command(input_file, options, encoder, video_bitrate, 2, log_prefix, output_file), check=True)
+            actual_bytes = os.path.getsize(output_file)
+
+    return actual_bytes
+
+# 质量目标模式：各编码器的 CRF 搜索范围
+CRF_ENCODERS = {'h264': ('libx264', 16, 40), 'hevc': ('libx265', 16, 40), 'av1': ('libaom-av1', 20, 55)}
+# 各质量指标的输出解析方式
+QUALITY_PATTERNS = {
+    'ssim': r"SSIM .*All:([\d.]+)",
+    'psnr': r"PSNR .*average:([\d.]+|inf)",
+    'vmaf': r"VMAF score: ([\d.]+)"
+}
+CRF_CACHE_DIR = os.path.join(CACHE_DIR, 'crf')
+# 测量方式变化时递增，使旧的缓存结果失效
+CRF_CACHE_VERSION = 2
+
+def get_sample_segments(video_path, sample_count=4, sample_seconds=4.0):
+    # 在片头片尾之外均匀选取几段有代表性的片段
+    duration = float(probe_cached(video_path)["format"]["duration"])
+    sample_seconds = min(sample_seconds, duration / sample_count)
+    return [(duration * (i + 1) / (sample_count + 1) - sample_seconds / 2, sample_seconds) for i in range(sample_count)]
+
+def get_segment_cache_path(video_path, start, seconds, encoder, metric, options):
+    stat = os.stat(video_path)
+    key = json.dumps([CRF_CACHE_VERSION, os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns,
+                      round(start, 3), seconds, encoder, metric, options])
+    return os.path.join(CRF_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+def measure_segment(video_path, start, seconds, encoder, crf, metric, options, temp_dir):
+    # 每段的结果按 CRF 缓存，同一片段同一参数不再重复编码
+    cache_path = get_segment_cache_path(video_path, start, seconds, encoder, metric, options)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+    if str(crf) in results:
+        return results[str(crf)]
+
+    # 编码片段，然后与经过同样滤镜（帧率、缩放、去噪等）处理的原片段比较，只衡量编码本身的损失
+    sample_path = os.path.join(temp_dir, f"{start:.3f}_{crf}.mkv")
+    reference = f"[1:v]{options[options.index('-vf') + 1]}[src];[src]" if '-vf' in options else "[1:v]"
+    lavfi = f"{reference}[0:v]scale2ref[ref][dist];[dist][ref]{'libvmaf' if metric == 'vmaf' else metric}"
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-ss", str(start), "-t", str(seconds), "-i", video_path] + options +
+        ["-c:v", encoder, "-crf", str(crf), "-an", sample_path],
+        check=True
+    )
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-i", sample_path, "-ss", str(start), "-t", str(seconds), "-i", video_path,
+         "-lavfi", lavfi, "-f", "null", "-"],
+        capture_output=True, text=True, check=True
+    )
+    os.remove(sample_path)
+    match = re.findall(QUALITY_PATTERNS[metric], result.stderr)
+    if not match:
+        raise ValueError(f"cannot read {metric} score")
+    score = float(match[-1])
+
+    # 与其他进程写入的结果合并后原子地保存
+    os.makedirs(CRF_CACHE_DIR, exist_ok=True)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+    results[str(crf)] = score
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+    os.replace(temp_path, cache_path)
+    return score
+
+def search_crf(video_path, codec, options, quality_target, metric='ssim', sample_count=4, sample_seconds=4.0,
+               workers=None):
+    # 二分查找仍满足质量目标的最大 CRF（即体积最小的设置），每个 CRF 只编码采样片段
+    encoder, low, high = CRF_ENCODERS.get(codec, CRF_ENCODERS['h264'])
+    segments = get_sample_segments(video_path, sample_count, sample_seconds)
+    best = None
+
+    with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor(max_workers=workers or len(segments)) as executor:
+        while low <= high:
+            crf = (low + high) // 2
+            scores = list(executor.map(
+                lambda segment: measure_segment(video_path, segment[0], segment[1], encoder, crf, metric, options, temp_dir),
+                segments
+            ))
+            # 以最差的片段为准
+            score = min(scores)
+            print(f"CRF {crf}: {metric} {score:.4f}")
+            if score >= quality_target:
+                best = crf
+                low = crf + 1
+            else:
+                high = crf - 1
+
+    return encoder, best
+
 def compress_video(input_file, output_file, scale_factor=None, bitrate=None, codec=None, frame_rate=None,
-                   color_depth=None, color_space=None, denoise=False, stabilize=False):
+                   color_depth=None, color_space=None, denoise=False, stabilize=False, target_size=None,
+                   quality_target=None, quality_metric='ssim', chunked=False, workers=None, scene_threshold=None):
     video_info = get_video_info(input_file)
+    if video_info is None:
+        # 探测失败的原因已由 get_video_info 打印
+        return
 
-    # 基础 FFmpeg 命令
-    command = ["ffmpeg", "-i", input_file]
+    # 滤镜与输出参数，目标大小模式的两遍编码共用这一部分
+    command = []
 
-    # 获取原始分辨率
+    # 缩放、帧率、去噪和去抖合并为一条滤镜链；只有缩放时才需要原始分辨率
+    source_size, scale = None, None
     if scale_factor:
-        width, height = video_info["width"], video_info["height"]
-        new_width = int(width * scale_factor)
-        new_height = int(height * scale_factor)
-        command += ["-vf", f"scale={new_width}:{new_height}"]
+        source_size = (video_info["width"], video_info["height"])
+        # 保持偶数尺寸，满足 yuv420 编码的要求
+        scale = tuple(int(size * float(scale_factor)) // 2 * 2 for size in source_size)
+    filter_chain = build_filter_chain(
+        source_size=source_size, fps=frame_rate, scale=scale, denoise=denoise, stabilize=stabilize
+    )
+    if filter_chain:
+        command += ["-vf", filter_chain]
+
+    # 设置色深和色彩空间（8 位像素格式没有位深后缀，如 yuv420p）
+    pix_fmt = None
+    if color_depth or color_space:
+        color_depth = color_depth or video_info['color_depth']
+        color_space = color_space or video_info['color_space']
+        pix_fmt = f"yuv{color_space.replace(':', '')}p" + ("" if color_depth == "8" else f"{color_depth}le")
+        command += ["-pix_fmt", pix_fmt]
+
+    # 目标大小模式：两遍编码，码率由时长和音频码率算出
+    if target_size:
+        try:
+            actual_bytes = compress_to_target_size(input_file, output_file, target_size, codec, command)
+            print(f"Compression complete: {actual_bytes / 1024 / 1024:.2f}MB (target {target_size}MB)")
+        except (subprocess.CalledProcessError, KeyError, ValueError) as e:
+            print("Fail to compress:", e)
+        return
+
+    # 质量目标模式：在采样片段上搜索 CRF，只有最终编码使用完整文件
+    if quality_target:
+        if quality_metric == 'vmaf' and 'libvmaf' not in get_capabilities()[1]['filters']:
+            print("libvmaf is not available, using SSIM")
+            quality_metric = 'ssim'
+        try:
+            encoder, crf = search_crf(input_file, codec, command, quality_target, quality_metric)
+            if crf is None:
+                print("No CRF in range meets the quality target")
+                return
+            print(f"Chosen CRF: {crf}")
+            subprocess.run(["ffmpeg", "-i", input_file] + command + ["-c:v", encoder, "-crf", str(crf), output_file],
+                           check=True)
+            print("Compression complete")
+        except (subprocess.CalledProcessError, KeyError, ValueError) as e:
+            print("Fail to compress:", e)
+        return
+
+    # 源文件已满足编码、像素格式、帧率和码率要求时不再重新编码（帧率由 plan_passthrough 单独比较）
+    try:
+        spatial_chain = build_filter_chain(source_size=source_size, scale=scale, denoise=denoise, stabilize=stabilize)
+        plan, reason = plan_passthrough(probe_cached(input_file), input_file, output_file, codec=codec, pix_fmt=pix_fmt,
+                                        frame_rate=frame_rate, bitrate=bitrate, filter_chain=spatial_chain,
+                                        require_rate_control=True)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        plan, reason = 'encode', f'cannot probe source: {e}'
+    print(f"Plan: {plan} ({reason})")
+    if plan != 'encode':
+        try:
+            run_passthrough(plan, input_file, output_file)
+            print("Compression complete")
+            return
+        except (subprocess.CalledProcessError, OSError) as e:
+            # 流复制失败（例如封装不支持某条流）时退回正常编码
+            print(f"Passthrough failed ({e}), re-encoding")
 
     # 设置码率
     if bitrate:
@@ -169,28 +295,18 @@ def compress_video(input_file, output_file, scale_factor=None, bitrate=None, cod
         else:
             command += ["-c:v", codec]
 
-    # 设置帧率
-    if frame_rate:
-        command += ["-r", str(frame_rate)]
-
-    # 设置色深和色彩空间
-    if color_depth or color_space:
-        if color_depth and color_space:
-            command += ["-pix_fmt", f"yuv{color_space.replace(':', '')}p{color_depth}le"]
+    # 分块模式：各块并行编码后拼接
+    if chunked:
+        success, result = encode_chunked(input_file, output_file, command, workers=workers,
+                                         scene_threshold=scene_threshold)
+        if success:
+            print("Compression complete")
         else:
-            if color_depth:
-                command += ["-pix_fmt", f"yuv{video_info['color_space'].replace(':', '')}p{color_depth}le"]
-            else:
-                command += ["-pix_fmt", f"yuv{color_space.replace(':', '')}p{video_info['color_depth']}le"]
+            print("Fail to compress:", result)
+        return
 
-    # 添加去噪和去抖
-    if denoise:
-        command += ["-vf", "hqdn3d=1.5:1.5:6.0:6.0"]
-    if stabilize:
-        command += ["-vf", "deshake"]
-
-    # 输出文件设置
-    command += [output_file]
+    # 基础 FFmpeg 命令和输出文件设置
+    command = ["ffmpeg", "-i", input_file] + command + [output_file]
 
     # 执行命令
     try:
@@ -199,17 +315,149 @@ def compress_video(input_file, output_file, scale_factor=None, bitrate=None, cod
     except subprocess.CalledProcessError as e:
         print("Fail to compress:", e)
 
+# 码率阶梯模式：解码一次，用 split 分成多个缩放分支，在同一个进程里编码所有版本
+# 每一级为 (高度, 码率)，高于源视频的级别会被跳过
+DEFAULT_LADDER = [(1080, '5000k'), (720, '2800k'), (480, '1400k'), (360, '800k')]
+# 关键帧间隔（秒），各版本在相同时间点放置关键帧，便于一起切片打包
+GOP_SECONDS = 2
+
+# package_format 为 hls 或 dash 时不输出 MP4 文件，而是由同一个 ffmpeg 进程直接写出切片和清单，编码过程中即可上传
+# 返回 (True, 输出路径列表) 或 (False, 错误)
+def compress_ladder(input_file, output_dir, ladder=DEFAULT_LADDER, codec='h264', frame_rate=None, denoise=False,
+                    stabilize=False, gop_seconds=GOP_SECONDS, package_format=None, segment_type='fmp4',
+                    segment_seconds=SEGMENT_SECONDS):
+    try:
+        info = probe_cached(input_file)
+        video = next((stream for stream in info["streams"] if stream.get("codec_type") == "video"), None)
+        if video is None:
+            print("Fail to compress: no video stream")
+            return False, "no video stream"
+        has_audio = any(stream.get("codec_type") == "audio" for stream in info["streams"])
+        width, height = int(video["width"]), int(video["height"])
+    except (subprocess.CalledProcessError, OSError, KeyError, ValueError) as e:
+        print("Fail to compress:", e)
+        return False, e
+    # 帧率无效（如 "0/0"）时依次退回 avg_frame_rate 和 25 fps
+    frame_duration = get_frame_duration({"r_frame_rate": str(frame_rate)} if frame_rate else video)
+    gop = max(1, round(gop_seconds / frame_duration))
+
+    rungs = [(rung_height, rung_bitrate) for rung_height, rung_bitrate in ladder if rung_height <= height]
+    if not rungs:
+        rungs = [(height, ladder[-1][1])]
+
+    # 帧率、去噪和去抖在 split 之前只做一次，之后每个分支只做缩放
+    shared_chain = build_filter_chain(fps=frame_rate, denoise=denoise, stabilize=stabilize)
+    graph = f"[0:v]{shared_chain + ',' if shared_chain else ''}split={len(rungs)}" + "".join(f"[s{i}]" for i in range(len(rungs)))
+    for i, (rung_height, _) in enumerate(rungs):
+        rung_width = round(width * rung_height / height / 2) * 2
+        branch_chain = build_filter_chain(source_size=(width, height), scale=(rung_width, rung_height)) or "null"
+        graph += f";[s{i}]{branch_chain}[v{i}]"
+
+    # 对齐关键帧：固定 GOP、关闭场景切换插入关键帧，并按时间强制关键帧
+    # 硬件编码器中只有 nvenc 能关闭场景切换关键帧并把强制关键帧编码为 IDR，其它硬件编码器改用软件编码
+    codec_process = auto_encode(codec)
+    encoder = f'{codec}_nvenc' if codec_process == 'nvenc' else TWO_PASS_ENCODERS.get(codec, codec)
+    keyframe_options = ["-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+                        "-force_key_frames", f"expr:gte(t,n_forced*{gop_seconds})"]
+    if encoder == 'libx265':
+        # libx265 不读取 -sc_threshold 和 -keyint_min
+        keyframe_options += ["-x265-params", f"keyint={gop}:min-keyint={gop}:scenecut=0"]
+    elif codec_process == 'nvenc':
+        keyframe_options += ["-forced-idr", "1", "-no-scenecut", "1"]
+
+    os.makedirs(output_dir, exist_ok=True)
+    command = ["ffmpeg", "-y", "-i", input_file, "-filter_complex", graph]
+    if package_format:
+        package_type = get_package_type(package_format, segment_type)
+        if codec not in PACKAGE_CODECS[package_type]['video']:
+            print(f"{codec} cannot be packaged as {package_type}")
+            return False, f"{codec} cannot be packaged as {package_type}"
+        # 切片时长取 GOP 的整数倍，保证每个切片都从对齐的关键帧开始
+        segment_seconds = max(1, round(segment_seconds / gop_seconds)) * gop_seconds
+
+        # 所有版本写入同一个复用器：HLS 每个版本带一份音频，DASH 的音频单独成为一个自适应集
+        variants = []
+        for i, (rung_height, rung_bitrate) in enumerate(rungs):
+            bufsize = f"{int(parse_bitrate(rung_bitrate) * 2)}"
+            command += ["-map", f"[v{i}]", f"-b:v:{i}", rung_bitrate, f"-maxrate:v:{i}", rung_bitrate,
+                        f"-bufsize:v:{i}", bufsize]
+            if has_audio and package_format != 'dash':
+                command += ["-map", "0:a:0"]
+            variants.append(f"v:{i},a:{i},name:{rung_height}p" if has_audio else f"v:{i},name:{rung_height}p")
+        if has_audio and package_format == 'dash':
+            command += ["-map", "0:a:0"]
+        command += ["-c:v", encoder] + keyframe_options
+        if codec == 'hevc' and package_type != 'hls_ts':
+            # Apple 设备要求 fMP4 中的 HEVC 使用 hvc1 标签
+            command += ["-tag:v", "hvc1"]
+        if has_audio:
+            command += ["-c:a", "aac", "-b:a", "128k"]
+        command += build_package_options(output_dir, package_format, segment_type, segment_seconds, variants, has_audio)
+
+        try:
+            subprocess.run(command, check=True)
+            print(f"Ladder packaged: {get_manifest_path(output_dir, package_format)}")
+            return True, [get_manifest_path(output_dir, package_format)]
+        except subprocess.CalledProcessError as e:
+            print("Fail to compress:", e)
+            return False, e
+
+    output_paths = []
+    for i, (rung_height, rung_bitrate) in enumerate(rungs):
+        output_path = os.path.join(output_dir, f"{rung_height}p.mp4")
+        bufsize = f"{int(parse_bitrate(rung_bitrate) * 2)}"
+        command += ["-map", f"[v{i}]", "-map", "0:a?", "-c:v", encoder, "-b:v", rung_bitrate, "-maxrate", rung_bitrate,
+                    "-bufsize", bufsize] + keyframe_options + ["-c:a", "aac", "-b:a", "128k", output_path]
+        output_paths.append(output_path)
+
+    try:
+        subprocess.run(command, check=True)
+        print(f"Ladder complete: {', '.join(output_paths)}")
+        return True, output_paths
+    except subprocess.CalledProcessError as e:
+        print("Fail to compress:", e)
+        return False, e
+
 # 获取用户输入
 input_file = input("Please enter video path")
 output_file = input("please enter a path for output")
 
+# 码率阶梯模式：输出路径为目录，一次解码输出所有分辨率和码率版本
+if input("Encode a full resolution/bitrate ladder in one pass? (y/n)：").lower() == "y":
+    print("Choose an encode mode: 1.H.265 2.AV1  3.H.264")
+    codec_choice = input("Please choose (1/2/3)：")
+    codec = {"1": "hevc", "2": "av1", "3": "h264"}.get(codec_choice, "h264")
+    # 直接输出 HLS/DASH 切片时，切片在编码过程中陆续写出
+    print("Choose an output: 1. MP4 files  2. HLS (fMP4)  3. HLS (TS)  4. DASH")
+    output_choice = input("Please choose (1/2/3/4)：")
+    package_format = {"2": "hls", "3": "hls", "4": "dash"}.get(output_choice)
+    segment_type = 'ts' if output_choice == '3' else 'fmp4'
+    compress_ladder(input_file, output_file, codec=codec, package_format=package_format, segment_type=segment_type)
+    exit()
+
 # 分辨率
 resolution = input("Please enter the resolution scaling factor:")
 resolution = resolution if resolution else None
 
+# 目标大小（设置后忽略码率，使用两遍编码）
+target_size = input("Enter target file size in MB (press Enter to skip):")
+target_size = float(target_size) if target_size else None
+
+# 质量目标（设置后在采样片段上自动搜索 CRF）
+quality_target = None
+quality_metric = 'ssim'
+if not target_size:
+    print("Choose a quality metric for CRF search: 1. SSIM  2. PSNR  3. VMAF  (press Enter to skip)")
+    metric_choice = input("Please choose (1/2/3)：")
+    if metric_choice in ("1", "2", "3"):
+        quality_metric = {"1": "ssim", "2": "psnr", "3": "vmaf"}[metric_choice]
+        quality_target = float(input("Enter the quality target (for example, SSIM 0.98, PSNR 42, VMAF 93):"))
+
 # 码率
-bitrate = input("Enter bitrate")
-bitrate = bitrate if bitrate else None
+bitrate = None
+if not target_size and not quality_target:
+    bitrate = input("Enter bitrate")
+    bitrate = bitrate if bitrate else None
 
 # 编码格式
 print("Choose an encode mode: 1.H.265 2.AV1  3.H.264")
@@ -229,11 +477,21 @@ print("choose a color space: 1. 4:2:0  2. 4:2:2")
 color_space_choice = input("Please choose (1/2)：")
 color_space = "4:2:2" if color_space_choice == "2" else "4:2:0"
 
+# 分块并行编码（仅用于码率模式）
+chunked = False
+scene_threshold = None
+if not target_size and not quality_target:
+    chunked = input("Use chunked parallel encoding? (y/n)：").lower() == "y"
+    if chunked:
+        scene_threshold = input("Enter a scene threshold to split at scene cuts (e.g. 0.4, Enter for keyframes):")
+        scene_threshold = float(scene_threshold) if scene_threshold else None
+
 # 去噪和去抖
 denoise = input("If enable Video Denoising(y/n)：").lower() == "y"
 stabilize = input("If enable Video Stabilization(y/n)：").lower() == "y"
 
 # 调用视频压缩函数
 compress_video(
-    input_file, output_file, resolution, bitrate, codec, frame_rate, color_depth, color_space, denoise, stabilize
+    input_file, output_file, resolution, bitrate, codec, frame_rate, color_depth, color_space, denoise, stabilize,
+    target_size, quality_target, quality_metric, chunked, scene_threshold=scene_threshold
 )
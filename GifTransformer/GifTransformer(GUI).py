@@ -1,6 +1,17 @@
 import subprocess
+import threading
 import re
 import wx
+from collections import deque
+import sys
+import os
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.filters import build_filter_chain
+from Common.keyframe_index import plan_seek
+# 目标体积模式直接复用命令行版本的实现（同一目录）
+from GifTransformer import video_to_animation_target_size
 
 def fps_input_check(fps: str) -> bool:
     # 只支持整数
@@ -75,28 +86,60 @@ def calculate_seconds_difference(start_time: str, end_time: str) -> str:
     # 返回时间差，保留小数点后两位
     return "{:.2f}".format(end_total_seconds - start_total_seconds)
 
-def video_to_gif(video_path, fps, width, height, start_time=None, end_time=None, output_path=None):
-    print(f"Type of start_time: {type(start_time)}, Value: {start_time}")
-    print(f"Type of end_time: {type(end_time)}, Value: {end_time}")
-    command = ['ffmpeg']  # 初始命令部分
-
-    # 如果有 start_time，则添加 -ss 参数
-    if start_time:
-        command.extend(['-ss', str(start_time)])
-
-    # 添加输入文件路径
-    command.extend(['-i', video_path])
-
-    # 如果有 end_time，则计算时间差并添加 -t 参数
-    if end_time:
-        command.extend(
-        ['-t', calculate_seconds_difference(str(start_time) if start_time else "00:00:00", str(end_time))]
+# 获取视频总时长（秒）
+def get_duration(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path],
+        capture_output=True, text=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+# 只运行一次 ffmpeg：从 -progress 输出中读取进度，stderr 只保留最后若干行
+def run_ffmpeg_with_progress(command, duration=None, on_progress=None, max_log_lines=200):
+    command = command[:1] + ['-nostdin', '-progress', 'pipe:1', '-nostats'] + command[1:]
+    log = deque(maxlen=max_log_lines)
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        # 在后台线程中读取 stderr，避免管道写满导致 ffmpeg 阻塞
+        stderr_thread = threading.Thread(
+            target=lambda: log.extend(line.rstrip() for line in process.stderr), daemon=True
         )
+        stderr_thread.start()
+
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            # out_time_us 和 out_time_ms 的单位都是微秒
+            if key in ['out_time_us', 'out_time_ms'] and value.isdigit() and duration and on_progress:
+                on_progress(min(1.0, int(value) / 1000000 / duration))
+            elif key == 'progress' and value == 'end' and on_progress:
+                on_progress(1.0)
+        stderr_thread.join()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr='\n'.join(log))
+    return '\n'.join(log)
+
+def video_to_gif(video_path, fps, width, height, start_time=None, end_time=None, output_path=None, on_progress=None):
+    start_seconds = float(calculate_seconds_difference("00:00:00", str(start_time))) if start_time else 0
+    end_seconds = float(calculate_seconds_difference("00:00:00", str(end_time))) if end_time else None
+    # 输入端粗定位，输出端补上到起点的剩余部分
+    input_seek, output_seek = plan_seek(video_path, start_seconds, end_seconds)
+    command = ['ffmpeg'] + input_seek + ['-i', video_path] + output_seek
 
-    if width and height:
-        fps_and_compression = f'fps={fps}, scale={width}:{height}:flags=lanczos'
+    if end_time:
+        duration = end_seconds - start_seconds
     else:
-        fps_and_compression = f'fps={fps}'
+        # 没有结束时间时，用视频总时长计算进度
+        duration = get_duration(video_path)
+        if duration and start_time:
+            duration -= float(calculate_seconds_difference("00:00:00", str(start_time)))
+
+    fps_and_compression = build_filter_chain(
+        fps=fps, scale=(width, height) if width and height else None, scale_flags='lanczos'
+    )
 
     # 添加 GIF 转换的选项
     command.extend([
@@ -109,13 +152,11 @@ def video_to_gif(video_path, fps, width, height, start_time=None, end_time=None,
     ])
 
     try:
-        subprocess.run(command, check=True)
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print(result.stdout.decode())  # 打印标准输出
-        print(result.stderr.decode())  # 打印错误输出
+        log = run_ffmpeg_with_progress(command, duration, on_progress)
+        print(log)  # 打印 ffmpeg 输出
         return True, f'Gif has successfully created at {output_path}'
     except subprocess.CalledProcessError as e:
-        return False, e
+        return False, f'{e}\n{e.stderr}'
 
 class GifTransformerWX(wx.Frame):
     def __init__(self, *args, **kw):
@@ -200,11 +241,26 @@ class GifTransformerWX(wx.Frame):
         self.hbox7.Add(self.height, flag=wx.ALL, border=5)
         self.vbox.Add(self.hbox7, flag=wx.EXPAND)
 
+        # 目标体积模式：填写体积上限后自动选择帧率、宽度和颜色数，忽略上面的帧率和缩放设置
+        self.hbox8 = wx.BoxSizer(wx.HORIZONTAL)
+        self.size_limit_text = wx.StaticText(panel, label="Size limit in MB (optional):")
+        self.hbox8.Add(self.size_limit_text, flag=wx.ALL, border=5)
+        self.size_limit = wx.TextCtrl(panel)
+        self.hbox8.Add(self.size_limit, flag=wx.ALL, border=5)
+        self.vbox.Add(self.hbox8, flag=wx.EXPAND)
+
+        self.output_format = wx.RadioBox(panel, label="Output format", choices=['gif', 'webp', 'apng'])
+        self.vbox.Add(self.output_format, flag=wx.ALL, border=5)
+
         # 剪切按钮
         self.transform_button = wx.Button(panel, label="Transform")
         self.transform_button.Bind(wx.EVT_BUTTON, self.on_transform)
         self.vbox.Add(self.transform_button, flag=wx.ALL, border=5)
 
+        # 进度条
+        self.progress = wx.Gauge(panel, range=100)
+        self.vbox.Add(self.progress, flag=wx.EXPAND | wx.ALL, border=5)
+
         # 设置面板的布局管理器
         panel.SetSizer(self.vbox)
         panel.Layout()
@@ -240,8 +296,17 @@ class GifTransformerWX(wx.Frame):
         output_name = self.file_name.GetValue()
         fps = self.fps.GetValue()
         compression_or_not = self.compression.GetStringSelection()
-
-        if compression_or_not == 'No':
+        size_limit = self.size_limit.GetValue().strip()
+
+        if size_limit:
+            try:
+                max_bytes = int(float(size_limit) * 1024 ** 2)
+            except ValueError:
+                max_bytes = 0
+            if max_bytes <= 0:
+                wx.MessageBox('Size limit input is invalid', 'Error', wx.OK | wx.ICON_ERROR)
+                return
+        elif compression_or_not == 'No':
             width, height = None, None
         else:
             width, height = self.width.GetValue(), self.height.GetValue()
@@ -249,7 +314,7 @@ class GifTransformerWX(wx.Frame):
                 wx.MessageBox('Width or height input invalid', 'Error', wx.OK | wx.ICON_ERROR)
                 return
 
-        if not fps_input_check(fps):
+        if not size_limit and not fps_input_check(fps):
             wx.MessageBox('fps input is invalid', 'Error', wx.OK | wx.ICON_ERROR)
             return
 
@@ -289,19 +354,64 @@ class GifTransformerWX(wx.Frame):
 
         print(end_time)
 
-        flag, message_ = video_to_gif(input_path, fps, width, height, start_time, end_time, output_path_)
+        if size_limit:
+            output_format = self.output_format.GetStringSelection()
+            extension = 'png' if output_format == 'apng' else output_format
+            output_path_ = f'{output_path}/{output_name}.{extension}'
+            job = lambda: self.transform_target_size(input_path, output_path_, max_bytes, start_time, end_time)
+        else:
+            job = lambda: video_to_gif(
+                input_path, fps, width, height, start_time, end_time, output_path_, on_progress=self.on_progress
+            )
 
+        # ffmpeg 在工作线程中运行，界面保持响应；转换期间禁用按钮，防止重复启动
+        self.progress.SetValue(0)
+        self.transform_button.Disable()
+        threading.Thread(target=self.run_transform, args=(job,), daemon=True).start()
+
+    # 工作线程：执行转换，结果通过 wx.CallAfter 交给主线程显示
+    def run_transform(self, job):
+        try:
+            flag, message_ = job()
+        except Exception as e:
+            # 任何异常都交回主线程显示，否则按钮会一直处于禁用状态
+            flag, message_ = False, f'{e}'
+        wx.CallAfter(self.on_transform_done, flag, message_)
+
+    def on_transform_done(self, flag, message_):
+        # 转换期间窗口可能已被关闭
+        if not self:
+            return
+        self.transform_button.Enable()
         if not flag:
             wx.MessageBox(message_, 'Error', wx.OK | wx.ICON_ERROR)
-            return
         else:
             wx.MessageBox(message_,'Success',wx.OK | wx.ICON_INFORMATION)
-            return
+
+    def transform_target_size(self, input_path, output_path, max_bytes, start_time, end_time):
+        try:
+            flag, settings = video_to_animation_target_size(
+                input_path, output_path, max_bytes, start_time or None, end_time or None, on_progress=self.on_progress
+            )
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            return False, f'{e}'
+        if not flag:
+            return False, f'Cannot fit the output into {max_bytes / (1024 ** 2):.2f} MB even with the smallest settings.'
+        fps, width, level = settings
+        return True, f'Animation has successfully created at {output_path} (fps={fps}, width={width}, level={level})'
+
+    # 进度回调来自工作线程，只能通过 wx.CallAfter 更新界面
+    def on_progress(self, fraction):
+        wx.CallAfter(self.set_progress, fraction)
+
+    def set_progress(self, fraction):
+        if self:
+            self.progress.SetValue(int(fraction * 100))
 
 if __name__ == "__main__":
     app = wx.App()
     frame = GifTransformerWX(None)
     frame.SetTitle('Video Cutter with GUI')
-    frame.SetSize((400, 400))
+    frame.SetSize((400, 520))
     frame.Show()
     app.MainLoop()
\ No newline at end of file
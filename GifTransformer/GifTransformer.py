@@ -1,6 +1,31 @@
 import subprocess
+import tempfile
+import hashlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common import CACHE_DIR
+from Common.keyframe_index import plan_seek
+from Common.filters import build_filter_chain
+
+# 目标体积模式的候选参数（帧率, 宽度, 颜色数或 WebP 质量），按画质从高到低排列
+ANIMATION_LADDERS = {
+    'gif': [
+        (15, 480, 256), (12, 480, 256), (12, 400, 256), (10, 400, 256), (10, 320, 256), (10, 320, 128),
+        (8, 320, 128), (8, 240, 128), (8, 240, 64), (6, 240, 64), (6, 160, 64), (5, 160, 32)
+    ],
+    'webp': [
+        (15, 480, 80), (12, 480, 75), (12, 400, 75), (10, 400, 70), (10, 320, 70), (10, 320, 60),
+        (8, 320, 60), (8, 240, 50), (8, 240, 40), (6, 240, 40), (6, 160, 30), (5, 160, 20)
+    ]
+}
+ANIMATION_LADDERS['apng'] = ANIMATION_LADDERS['gif']
+# 无损中间帧缓存的总大小上限，超出时删除最久未使用的文件
+FRAMES_CACHE_MAX_BYTES = 4 * 1024 ** 3
 
 def remove_trailing_slash(path: str) -> str:
     if path.endswith('/'):
@@ -49,37 +74,268 @@ def calculate_seconds_difference(start_time: str, end_time: str) -> str:
     # 返回时间差，保留小数点后两位
     return "{:.2f}".format(end_total_seconds - start_total_seconds)
 
-def video_to_gif(video_path, start_time=None, end_time=None, output_path=None):
+# 把起止时间（hh:mm:ss 或秒）转换为相对于片头的秒数，没有终点时为 None
+def get_seek_range(start_time, end_time):
+    start_seconds = float(calculate_seconds_difference("00:00:00", str(start_time))) if start_time else 0.0
+    end_seconds = float(calculate_seconds_difference("00:00:00", str(end_time))) if end_time else None
+    return start_seconds, end_seconds
+
+# 调色板缓存路径：由源文件（路径、大小、修改时间）、时间范围、帧率和尺寸决定
+def get_palette_path(video_path, start_time, end_time, fps, width, dedupe=False):
+    stat = os.stat(video_path)
+    # 时间统一换算为秒（精确到毫秒），"5"、"00:00:05" 和 "0:0:5.000" 命中同一个调色板
+    start_seconds, end_seconds = get_seek_range(start_time, end_time)
+    end_seconds = round(end_seconds, 3) if end_seconds is not None else None
+    key = '|'.join(map(str, [
+        os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns,
+        round(start_seconds, 3), end_seconds, float(fps), int(width), bool(dedupe)
+    ]))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, 'palettes', f'{digest}.png')
+
+def video_to_gif(video_path, start_time=None, end_time=None, output_path=None,
+                 fps=10, width=320, palette=False, dither='sierra2_4a', dedupe=False):
     command = ['ffmpeg']  # 初始命令部分
 
-    # 如果有 start_time，则添加 -ss 参数
-    if start_time:
-        command.extend(['-ss', str(start_time)])
+    # 输入端粗定位到起点之前的关键帧，并只读取到终点（-t 作为输入选项）
+    input_seek, output_seek = plan_seek(video_path, *get_seek_range(start_time, end_time))
+    command.extend(input_seek)
 
     # 添加输入文件路径
     command.extend(['-i', video_path])
 
-    # 如果有 end_time，则计算时间差并添加 -t 参数
-    if end_time:
-        command.extend(
-            ['-t', calculate_seconds_difference(str(start_time) if start_time else "00:00:00", str(end_time))]
-        )
+    # 控制帧率和大小；去除重复帧时在缩小后的画面上比较（更快），被丢弃帧的时长并入前一帧的延时
+    fps_and_scale = build_filter_chain(
+        fps=fps, scale=(width, -1), scale_flags='lanczos', extra=['mpdecimate'] if dedupe else None
+    )
+    # 精确定位放在滤镜图最前面，调色板也只从所选范围内的画面生成
+    if output_seek:
+        fps_and_scale = f'trim=start={output_seek[1]},setpts=PTS-STARTPTS,{fps_and_scale}'
+    vsync_options = ['-fps_mode', 'vfr'] if dedupe else []
+    palette_temp = None
 
-    # 添加 GIF 转换的选项
-    command.extend([
-        '-vf',
-        'fps=10,scale=320:-1:flags=lanczos',  # 控制帧率和大小
-        '-gifflags',
-        '+transdiff',  # 优化GIF的平滑过渡
-        '-y',  # 覆盖输出文件
-        output_path
-    ])
+    if not palette:
+        # 添加 GIF 转换的选项
+        command.extend([
+            '-vf',
+            fps_and_scale,
+            *vsync_options,
+            '-gifflags',
+            '+transdiff',  # 优化GIF的平滑过渡
+            '-y',  # 覆盖输出文件
+            output_path
+        ])
+    else:
+        palette_path = get_palette_path(video_path, start_time, end_time, fps, width, dedupe)
+        if os.path.isfile(palette_path):
+            # 已有缓存的调色板，直接使用
+            command.extend([
+                '-i', palette_path,
+                '-lavfi', f'{fps_and_scale}[x];[x][1:v]paletteuse=dither={dither}',
+                *vsync_options, '-gifflags', '+transdiff', '-y', output_path
+            ])
+        else:
+            # 同一个滤镜图中生成调色板并使用，源视频只解码一次；同时把调色板写入缓存
+            os.makedirs(os.path.dirname(palette_path), exist_ok=True)
+            palette_temp = f'{palette_path}.{os.getpid()}.png'
+            command.extend([
+                '-lavfi',
+                f'{fps_and_scale},split[a][b];[a]palettegen,split[p][c];[b][p]paletteuse=dither={dither}[g]',
+                '-map', '[g]', *vsync_options, '-gifflags', '+transdiff', '-y', output_path,
+                '-map', '[c]', '-update', '1', '-y', palette_temp
+            ])
 
     try:
         subprocess.run(command, check=True)
+        # 裁剪或去重后没有任何帧时 ffmpeg 不会写出调色板，这时不缓存
+        if palette_temp and os.path.isfile(palette_temp):
+            os.replace(palette_temp, palette_path)
         print(f"GIF is successfully created at：{output_path}")
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"fail to transform：{e}")
+    finally:
+        if palette_temp and os.path.exists(palette_temp):
+            os.remove(palette_temp)
+
+# 获取视频总时长（秒）
+def get_duration(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+# 把所选时间范围解码一次，缩放到候选参数中的最大帧率和宽度，无损保存到缓存目录
+def get_intermediate_frames(video_path, start_time, end_time, fps, width):
+    stat = os.stat(video_path)
+    start_seconds, end_seconds = get_seek_range(start_time, end_time)
+    key = '|'.join(map(str, [
+        os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns,
+        round(start_seconds, 3), round(end_seconds, 3) if end_seconds is not None else None, fps, width
+    ]))
+    frames_dir = os.path.join(CACHE_DIR, 'frames')
+    frames_path = os.path.join(frames_dir, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.mkv")
+    if os.path.isfile(frames_path):
+        # 更新修改时间，作为最近使用时间参与淘汰
+        os.utime(frames_path)
+        return frames_path
+
+    input_seek, output_seek = plan_seek(video_path, start_seconds, end_seconds)
+    command = ['ffmpeg', '-nostdin', '-v', 'error', *input_seek]
+    os.makedirs(frames_dir, exist_ok=True)
+    # 每次写入使用独立的临时文件，并发生成同一范围时互不干扰
+    fd, temp_path = tempfile.mkstemp(dir=frames_dir, prefix='tmp', suffix='.mkv')
+    os.close(fd)
+    command.extend([
+        '-i', video_path, *output_seek, '-an', '-sn',
+        '-vf', build_filter_chain(fps=fps, scale=(f"'min({width},iw)'", -2), scale_flags='lanczos'),
+        '-c:v', 'ffv1', '-y', temp_path
+    ])
+    try:
+        subprocess.run(command, check=True)
+        os.replace(temp_path, frames_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    prune_frames_cache(frames_dir, keep=frames_path)
+    return frames_path
+
+# 中间帧缓存超过上限时，按最近使用时间从旧到新删除（正在写入的临时文件和当前文件除外）
+def prune_frames_cache(frames_dir, keep=None, max_bytes=None):
+    max_bytes = max_bytes or FRAMES_CACHE_MAX_BYTES
+    entries = []
+    for name in os.listdir(frames_dir):
+        path = os.path.join(frames_dir, name)
+        if name.startswith('tmp') or path == keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if keep and os.path.isfile(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+# 生成动图编码命令：gif/apng 使用调色板（level 为颜色数），webp 使用有损编码（level 为质量）
+def build_animation_command(input_options, output_path, output_format, fps, width, level, threads=None):
+    fps_and_scale = build_filter_chain(fps=fps, scale=(f"'min({width},iw)'", -1), scale_flags='lanczos')
+    command = ['ffmpeg', '-nostdin', '-v', 'error'] + input_options
+    if threads:
+        # 并行试编码时限制每个进程的线程数，避免总线程数超过 CPU 核数
+        command.extend(['-threads', str(threads), '-filter_threads', str(threads)])
+    if output_format == 'webp':
+        command.extend([
+            '-vf', fps_and_scale, '-c:v', 'libwebp', '-lossless', '0', '-q:v', str(level),
+            '-loop', '0', '-f', 'webp'
+        ])
+    else:
+        command.extend([
+            '-lavfi',
+            f'{fps_and_scale},split[a][b];[a]palettegen=max_colors={level}[p];[b][p]paletteuse=dither=sierra2_4a'
+        ])
+        if output_format == 'gif':
+            command.extend(['-gifflags', '+transdiff', '-f', 'gif'])
+        else:
+            command.extend(['-plays', '0', '-f', 'apng'])
+    command.extend(['-y', output_path])
+    return command
+
+# 目标体积模式：在抽样片段上并行试编码，估算每组参数的完整体积，选出不超过预算的最佳参数
+# on_progress(比例) 在试编码完成一个时和最终输出后调用（可能来自工作线程）
+def video_to_animation_target_size(video_path, output_path, max_bytes, start_time=None, end_time=None,
+                                   sample_count=3, sample_seconds=1.0, workers=None, on_progress=None):
+    extension = os.path.splitext(output_path)[1].lower().lstrip('.')
+    output_format = {'png': 'apng'}.get(extension, extension)
+    if output_format not in ANIMATION_LADDERS:
+        raise ValueError(f"Unsupported output format: {extension}")
+    ladder = ANIMATION_LADDERS[output_format]
+
+    # 计算所选范围的时长
+    if end_time:
+        duration = float(calculate_seconds_difference(str(start_time) if start_time else "00:00:00", str(end_time)))
+    else:
+        duration = get_duration(video_path)
+        if start_time:
+            duration -= float(calculate_seconds_difference("00:00:00", str(start_time)))
+
+    frames_path = get_intermediate_frames(
+        video_path, start_time, end_time, max(c[0] for c in ladder), max(c[1] for c in ladder)
+    )
+
+    # 在范围内均匀抽取若干个短片段；片段总长不短于范围时直接使用整段
+    if duration <= sample_count * sample_seconds:
+        samples = [[]]
+        sampled_duration = duration
+    else:
+        step = duration / sample_count
+        samples = [
+            ['-ss', f'{step * i + (step - sample_seconds) / 2:.3f}', '-t', f'{sample_seconds:.3f}']
+            for i in range(sample_count)
+        ]
+        sampled_duration = sample_count * sample_seconds
+
+    # 每个试编码进程分到的线程数，使并行进程的线程总数与 CPU 核数相当
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    threads = max(1, cpu_count // workers)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 所有候选参数和抽样片段的试编码并行执行
+        def trial(job):
+            candidate_index, sample_index = job
+            trial_path = os.path.join(temp_dir, f'{candidate_index}_{sample_index}.{output_format}')
+            command = build_animation_command(
+                samples[sample_index] + ['-i', frames_path], trial_path, output_format, *ladder[candidate_index],
+                threads=threads
+            )
+            subprocess.run(command, check=True)
+            return os.path.getsize(trial_path)
+
+        jobs = [(c, i) for c in range(len(ladder)) for i in range(len(samples))]
+        sizes = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 试编码占进度的前 80%，剩下的留给最终输出
+            for size in executor.map(trial, jobs):
+                sizes.append(size)
+                if on_progress:
+                    on_progress(0.8 * len(sizes) / len(jobs))
+
+    # 按抽样比例估算完整体积
+    estimates = [0.0] * len(ladder)
+    for (candidate_index, _), size in zip(jobs, sizes):
+        estimates[candidate_index] += size * duration / sampled_duration
+
+    # 从画质最高的候选开始，选择估算体积在预算内（留 10% 余量）的参数，实际超出时按误差修正后降级重试
+    correction = 1.0
+    candidate_index = 0
+    while candidate_index < len(ladder):
+        if estimates[candidate_index] * correction > max_bytes * 0.9 and candidate_index < len(ladder) - 1:
+            candidate_index += 1
+            continue
+        fps, width, level = ladder[candidate_index]
+        subprocess.run(
+            build_animation_command(['-i', frames_path], output_path, output_format, fps, width, level), check=True
+        )
+        size = os.path.getsize(output_path)
+        if size <= max_bytes:
+            print(f"Saved as: {output_path} ({size / (1024 ** 2):.2f} MB, fps={fps}, width={width}, level={level})")
+            if on_progress:
+                on_progress(1.0)
+            return True, (fps, width, level)
+        correction = size / estimates[candidate_index]
+        candidate_index += 1
+
+    print(f"Cannot fit {output_path} into {max_bytes / (1024 ** 2):.2f} MB even with the smallest settings.")
+    return False, None
 
 def is_valid_time_format(time_str):
     # 正则表达式匹配 hh:mm:ss 格式（支持秒部分带小数）
@@ -126,10 +382,10 @@ def get_valid_time_input(prompt):
 def get_valid_name_input():
     while True:
         output_name = input("Output name: ")
-        if is_valid_windows_filename(output_path):
+        if is_valid_windows_filename(output_name):
             return output_name
         else:
-            print(f"\tOutput name: {output_path} is invalid. Please try again.\t")
+            print(f"\tOutput name: {output_name} is invalid. Please try again.\t")
 
 # 用户输入示例
 if __name__ == "__main__":
@@ -156,5 +412,25 @@ if __name__ == "__main__":
 
         output_path_ = f'{output_path}/{output_name}.gif'
 
+        # 询问是否限制输出体积（例如聊天软件的 8 MB 上限）
+        size_limit = input("Size limit in MB (press Enter to skip): ").strip()
+        if size_limit:
+            output_format = input("Output format (gif/webp/apng, default gif): ").strip().lower() or 'gif'
+            extension = 'png' if output_format == 'apng' else output_format
+            try:
+                video_to_animation_target_size(
+                    video_path, f'{output_path}/{output_name}.{extension}',
+                    int(float(size_limit) * 1024 ** 2), start_time, end_time
+                )
+            except (ValueError, subprocess.CalledProcessError) as e:
+                print(f"fail to transform：{e}")
+            continue
+
+        # 询问是否使用调色板模式（画质更好、体积更小）
+        palette = input("Use palette mode for better quality? (yes/no): ").strip().lower() == 'yes'
+
+        # 询问是否合并重复帧（适合录屏、幻灯片）
+        dedupe = input("Merge duplicate frames (for screen recordings/slides)? (yes/no): ").strip().lower() == 'yes'
+
         # 调用函数转换视频为GIF
-        video_to_gif(video_path, start_time, end_time, output_path)
+        video_to_gif(video_path, start_time, end_time, output_path_, palette=palette, dedupe=dedupe)
@@ -1,107 +1,728 @@
 import subprocess
+import itertools
+import asyncio
+import struct
+import mmap
+import sys
+import csv
+import json
 import re
 import os
+from dataclasses import dataclass, field
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.probe_cache import PROBE_ENTRIES, lookup_probe_cache, store_probe_cache, probe_cached
+
+@dataclass(slots=True)
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: str | None = None
+    width: int | None = None
+    height: int | None = None
+    pix_fmt: str | None = None
+    bit_depth: int | None = None
+    frame_rate: float | None = None
+    bit_rate: int | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    channel_layout: str | None = None
+
+@dataclass(slots=True)
+class MediaInfo:
+    duration: float | None
+    size: int | None
+    bit_rate: int | None
+    format_name: str | None
+    streams: list[StreamInfo] = field(default_factory=list)
+
+    # 获取指定类型（video/audio）的第一条流
+    def first_stream(self, codec_type):
+        for stream in self.streams:
+            if stream.codec_type == codec_type:
+                return stream
+        return None
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_frame_rate(value):
+    # ffprobe 的帧率是分数形式，例如 30000/1001，0/0 表示未知
+    numerator, _, denominator = (value or "").partition("/")
+    numerator, denominator = to_float(numerator), to_float(denominator or 1)
+    if not numerator or not denominator:
+        return None
+    return numerator / denominator
+
+def parse_bit_depth(stream):
+    bit_depth = to_int(stream.get("bits_per_raw_sample"))
+    if bit_depth:
+        return bit_depth
+    pix_fmt = stream.get("pix_fmt")
+    if not pix_fmt:
+        return None
+    # 例如 yuv420p10le -> 10，否则为 8 位格式
+    depth_match = re.search(r"p(\d{1,2})(le|be)?$", pix_fmt)
+    return int(depth_match.group(1)) if depth_match else 8
+
+# 把 ffprobe 的 JSON 输出转换为 MediaInfo
+def parse_probe_json(data):
+    fmt = data.get("format", {})
+    streams = []
+    for stream in data.get("streams", []):
+        codec_type = stream.get("codec_type")
+        streams.append(StreamInfo(
+            index=stream.get("index", len(streams)),
+            codec_type=codec_type,
+            codec_name=stream.get("codec_name"),
+            width=to_int(stream.get("width")),
+            height=to_int(stream.get("height")),
+            pix_fmt=stream.get("pix_fmt"),
+            bit_depth=parse_bit_depth(stream) if codec_type == "video" else None,
+            frame_rate=(parse_frame_rate(stream.get("avg_frame_rate"))
+                        or parse_frame_rate(stream.get("r_frame_rate"))) if codec_type == "video" else None,
+            bit_rate=to_int(stream.get("bit_rate")),
+            sample_rate=to_int(stream.get("sample_rate")),
+            channels=to_int(stream.get("channels")),
+            channel_layout=stream.get("channel_layout")
+        ))
+    return MediaInfo(
+        duration=to_float(fmt.get("duration")),
+        size=to_int(fmt.get("size")),
+        bit_rate=to_int(fmt.get("bit_rate")),
+        format_name=fmt.get("format_name"),
+        streams=streams
+    )
+
+# 由色度采样（0 灰度、1 4:2:0、2 4:2:2、3 4:4:4）和位深得到 ffmpeg 的像素格式名
+def get_pix_fmt(chroma_format, bit_depth):
+    base = {0: "gray", 1: "yuv420p", 2: "yuv422p", 3: "yuv444p"}.get(chroma_format)
+    if base is None or not bit_depth:
+        return None
+    return base if bit_depth == 8 else f"{base}{bit_depth}le"
+
+# 从 avcC/hvcC/av1C/vpcC 解码配置中读取 (色度采样, 位深)，无法确定时返回 (None, None)
+AVC_HIGH_PROFILES = {100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135}
+def parse_codec_config(config_type, record):
+    if config_type == "avcC" and len(record) >= 7:
+        if record[1] not in AVC_HIGH_PROFILES:
+            # Baseline/Main/Extended 只支持 8 位 4:2:0
+            return 1, 8
+        # High 系列的色度采样和位深在 SPS、PPS 之后的扩展字段中
+        pos = 6
+        for _ in range(record[5] & 0x1F):
+            pos += 2 + struct.unpack_from(">H", record, pos)[0]
+        pps_count = record[pos]
+        pos += 1
+        for _ in range(pps_count):
+            pos += 2 + struct.unpack_from(">H", record, pos)[0]
+        if pos + 2 <= len(record):
+            return record[pos] & 0x03, (record[pos + 1] & 0x07) + 8
+    elif config_type == "hvcC" and len(record) >= 19:
+        return record[16] & 0x03, (record[17] & 0x07) + 8
+    elif config_type == "av1C" and len(record) >= 3:
+        flags = record[2]
+        high_bitdepth, twelve_bit, monochrome = flags & 0x40, flags & 0x20, flags & 0x10
+        subsampling_x, subsampling_y = flags & 0x08, flags & 0x04
+        bit_depth = (12 if twelve_bit else 10) if high_bitdepth else 8
+        chroma_format = 0 if monochrome else 1 if subsampling_x and subsampling_y else 2 if subsampling_x else 3
+        return chroma_format, bit_depth
+    elif config_type == "vpcC" and len(record) >= 7 and record[0] == 1:
+        # FullBox 头之后是 profile、level，再是位深（高 4 位）和色度采样（3 位）
+        chroma_subsampling = (record[6] >> 1) & 0x07
+        return {0: 1, 1: 1, 2: 2, 3: 3}.get(chroma_subsampling), record[6] >> 4
+    return None, None
+
+# MP4/MOV 文件头解析：只读取 moov 中需要的 box，不启动子进程
+MP4_EXTENSIONS = {".mp4", ".m4v", ".m4a", ".mov", ".3gp"}
+MP4_CODECS = {
+    "avc1": "h264", "avc3": "h264", "hvc1": "hevc", "hev1": "hevc", "av01": "av1",
+    "vp08": "vp8", "vp09": "vp9", "mp4v": "mpeg4", "apch": "prores", "apcn": "prores",
+    "apcs": "prores", "apco": "prores", "ap4h": "prores", "ap4x": "prores",
+    "mp4a": "aac", "Opus": "opus", "ac-3": "ac3", "ec-3": "eac3", "fLaC": "flac",
+    "alac": "alac", ".mp3": "mp3", "sowt": "pcm_s16le", "twos": "pcm_s16be"
+}
+
+# 遍历 [start, end) 范围内的 box，返回 (类型, 内容起点, 终点)
+def iter_mp4_boxes(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            break
+        yield box_type.decode("latin-1"), pos + header, pos + size
+        pos += size
+
+def find_mp4_box(data, start, end, path):
+    # 按路径逐层查找子 box，例如 ["mdia", "minf", "stbl"]
+    for box_type in path:
+        for child_type, child_start, child_end in iter_mp4_boxes(data, start, end):
+            if child_type == box_type:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+# 解析一条 trak：tkhd（画面尺寸）、mdhd（时间刻度）、hdlr（流类型）、stsd（编码）、stts（帧率）
+def parse_mp4_track(data, start, end, index):
+    mdia = find_mp4_box(data, start, end, ["mdia"])
+    hdlr = mdia and find_mp4_box(data, *mdia, ["hdlr"])
+    if not hdlr:
+        return None
+    handler = data[hdlr[0] + 8:hdlr[0] + 12].decode("latin-1")
+    codec_type = {"vide": "video", "soun": "audio"}.get(handler)
+    if not codec_type:
+        return None
+    stream = StreamInfo(index=index, codec_type=codec_type)
+
+    # 媒体时间刻度
+    timescale = None
+    mdhd = find_mp4_box(data, *mdia, ["mdhd"])
+    if mdhd:
+        timescale = struct.unpack_from(">I", data, mdhd[0] + (20 if data[mdhd[0]] == 1 else 12))[0]
+
+    stbl = find_mp4_box(data, *mdia, ["minf", "stbl"])
+    stsd = stbl and find_mp4_box(data, *stbl, ["stsd"])
+    if stsd and struct.unpack_from(">I", data, stsd[0] + 4)[0] > 0:
+        entry = stsd[0] + 8
+        fourcc = data[entry + 4:entry + 8].decode("latin-1")
+        stream.codec_name = MP4_CODECS.get(fourcc, fourcc.strip())
+        if codec_type == "video":
+            stream.width, stream.height = struct.unpack_from(">HH", data, entry + 32)
+            # VisualSampleEntry 的固定字段共 86 字节，之后是解码配置等子 box
+            entry_end = min(entry + struct.unpack_from(">I", data, entry)[0], stsd[1])
+            for config_type, config_start, config_end in iter_mp4_boxes(data, entry + 86, entry_end):
+                if config_type in ["avcC", "hvcC", "av1C", "vpcC"]:
+                    chroma_format, stream.bit_depth = parse_codec_config(config_type, data[config_start:config_end])
+                    stream.pix_fmt = get_pix_fmt(chroma_format, stream.bit_depth)
+                    break
+        else:
+            stream.channels = struct.unpack_from(">H", data, entry + 24)[0]
+            stream.sample_rate = struct.unpack_from(">I", data, entry + 32)[0] >> 16
+            stream.channel_layout = {1: "mono", 2: "stereo", 6: "5.1"}.get(stream.channels)
+
+    # 视频帧率 = 样本数 × 时间刻度 / 总时长
+    stts = stbl and find_mp4_box(data, *stbl, ["stts"])
+    if codec_type == "video" and stts and timescale:
+        entry_count = struct.unpack_from(">I", data, stts[0] + 4)[0]
+        samples = total = 0
+        for i in range(entry_count):
+            count, delta = struct.unpack_from(">II", data, stts[0] + 8 + i * 8)
+            samples += count
+            total += count * delta
+        if total:
+            stream.frame_rate = samples * timescale / total
+
+    # tkhd 中的显示尺寸（16.16 定点数），stsd 中没有尺寸时使用
+    tkhd = find_mp4_box(data, start, end, ["tkhd"])
+    if codec_type == "video" and tkhd and not stream.width:
+        offset = tkhd[0] + (88 if data[tkhd[0]] == 1 else 76)
+        width, height = struct.unpack_from(">II", data, offset)
+        stream.width, stream.height = width >> 16, height >> 16
+    return stream
+
+def parse_mp4_header(file_path):
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        moov = find_mp4_box(data, 0, len(data), ["moov"])
+        if not moov:
+            raise ValueError("moov box not found")
+
+        duration = None
+        streams = []
+        for box_type, start, end in iter_mp4_boxes(data, *moov):
+            if box_type == "mvhd":
+                if data[start] == 1:
+                    timescale, length = struct.unpack_from(">IQ", data, start + 20)
+                else:
+                    timescale, length = struct.unpack_from(">II", data, start + 12)
+                duration = length / timescale if timescale and length else None
+            elif box_type == "trak":
+                stream = parse_mp4_track(data, start, end, len(streams))
+                if stream:
+                    streams.append(stream)
+        size = len(data)
+
+    # 分片 MP4 等没有总时长的文件交给 ffprobe
+    if not duration or not streams:
+        raise ValueError("incomplete moov box")
+    return MediaInfo(
+        duration=duration,
+        size=size,
+        bit_rate=int(size * 8 / duration),
+        format_name="mov,mp4,m4a,3gp,3g2,mj2",
+        streams=streams
+    )
+
+# Matroska/WebM 文件头解析：只读取 Segment 中的 Info 和 Tracks，遇到 Cluster 即停止
+MKV_EXTENSIONS = {".mkv", ".webm", ".mka", ".mk3d"}
+MKV_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264", "V_MPEGH/ISO/HEVC": "hevc", "V_AV1": "av1", "V_VP8": "vp8",
+    "V_VP9": "vp9", "V_MPEG4/ISO/ASP": "mpeg4", "V_PRORES": "prores", "V_MPEG2": "mpeg2video",
+    "A_AAC": "aac", "A_OPUS": "opus", "A_VORBIS": "vorbis", "A_AC3": "ac3", "A_EAC3": "eac3",
+    "A_DTS": "dts", "A_FLAC": "flac", "A_MPEG/L3": "mp3", "A_PCM/INT/LIT": "pcm_s16le"
+}
+EBML_HEADER = 0x1A45DFA3
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TRACKS = 0x1654AE6B
+EBML_CLUSTER = 0x1F43B675
+
+# 读取变长整数：返回 (值, 长度)；keep_marker 为 True 时保留长度标记位（元素 ID）
+def read_ebml_vint(data, pos, keep_marker=False):
+    first = data[pos]
+    length = 8 - first.bit_length() + 1
+    if length > 8:
+        raise ValueError("invalid EBML variable-length integer")
+    value = int.from_bytes(data[pos:pos + length], "big")
+    if not keep_marker:
+        value &= (1 << (7 * length)) - 1
+        # 全 1 表示长度未知
+        if value == (1 << (7 * length)) - 1:
+            value = None
+    return value, length
+
+# 遍历 [start, end) 范围内的元素，返回 (ID, 内容起点, 终点)，长度未知时终点为 end
+def iter_ebml_elements(data, start, end):
+    pos = start
+    while pos < end:
+        element_id, id_length = read_ebml_vint(data, pos, keep_marker=True)
+        size, size_length = read_ebml_vint(data, pos + id_length)
+        data_start = pos + id_length + size_length
+        data_end = end if size is None else data_start + size
+        if data_end > end:
+            break
+        yield element_id, data_start, data_end
+        pos = data_end
+
+def read_ebml_uint(data, start, end):
+    return int.from_bytes(data[start:end], "big")
+
+def read_ebml_float(data, start, end):
+    return struct.unpack(">f" if end - start == 4 else ">d", data[start:end])[0]
+
+MKV_CODEC_CONFIGS = {"h264": "avcC", "hevc": "hvcC", "av1": "av1C"}
+
+# 视频轨道的 (位深, 像素格式)：优先使用 CodecPrivate 中的解码配置，其次是 Colour 元素
+def get_mkv_pixel_format(codec_name, fields):
+    chroma_format = bit_depth = None
+    codec_private = fields.get(0x63A2)
+    if codec_name in MKV_CODEC_CONFIGS and codec_private:
+        chroma_format, bit_depth = parse_codec_config(MKV_CODEC_CONFIGS[codec_name], codec_private)
+    elif codec_name == "vp9" and codec_private:
+        # VP9 的 CodecPrivate 是 (ID, 长度, 值) 列表：3 为位深，4 为色度采样
+        pos = 0
+        while pos + 3 <= len(codec_private):
+            feature_id, length = codec_private[pos], codec_private[pos + 1]
+            if feature_id == 3:
+                bit_depth = codec_private[pos + 2]
+            elif feature_id == 4:
+                chroma_format = {0: 1, 1: 1, 2: 2, 3: 3}.get(codec_private[pos + 2])
+            pos += 2 + length
+    elif codec_name == "vp8":
+        # VP8 只有 8 位 4:2:0
+        chroma_format, bit_depth = 1, 8
+
+    # Colour 中的采样是以 2 为底的对数：水平、垂直都为 1 即 4:2:0
+    bit_depth = bit_depth or fields.get(0x55B2)
+    if chroma_format is None and 0x55B3 in fields and 0x55B4 in fields:
+        chroma_format = {(1, 1): 1, (1, 0): 2, (0, 0): 3}.get((fields[0x55B3], fields[0x55B4]))
+    return bit_depth, get_pix_fmt(chroma_format, bit_depth)
+
+def parse_mkv_track(data, start, end, index):
+    fields = {}
+    for element_id, child_start, child_end in iter_ebml_elements(data, start, end):
+        if element_id in [0x83, 0x9F, 0xB0, 0xBA, 0x23E383, 0x6264, 0x55B2]:
+            # TrackType、Channels、PixelWidth、PixelHeight、DefaultDuration、BitDepth、BitsPerChannel
+            fields[element_id] = read_ebml_uint(data, child_start, child_end)
+        elif element_id == 0x86:
+            fields[element_id] = bytes(data[child_start:child_end]).rstrip(b"\0").decode("ascii", "replace")
+        elif element_id == 0xB5:
+            fields[element_id] = read_ebml_float(data, child_start, child_end)
+        elif element_id == 0x63A2:
+            # CodecPrivate
+            fields[element_id] = bytes(data[child_start:child_end])
+        elif element_id in [0xE0, 0xE1, 0x55B0]:
+            # Video、Audio、Colour 子元素
+            for sub_id, sub_start, sub_end in iter_ebml_elements(data, child_start, child_end):
+                if sub_id == 0xB5:
+                    fields[sub_id] = read_ebml_float(data, sub_start, sub_end)
+                elif sub_id == 0x55B0:
+                    for colour_id, colour_start, colour_end in iter_ebml_elements(data, sub_start, sub_end):
+                        # BitsPerChannel、ChromaSubsamplingHorz、ChromaSubsamplingVert
+                        if colour_id in [0x55B2, 0x55B3, 0x55B4]:
+                            fields[colour_id] = read_ebml_uint(data, colour_start, colour_end)
+                elif sub_id in [0x9F, 0xB0, 0xBA, 0x6264, 0x55B2]:
+                    fields[sub_id] = read_ebml_uint(data, sub_start, sub_end)
+
+    codec_type = {1: "video", 2: "audio"}.get(fields.get(0x83))
+    if not codec_type:
+        return None
+    codec_id = fields.get(0x86, "")
+    stream = StreamInfo(index=index, codec_type=codec_type, codec_name=MKV_CODECS.get(codec_id, codec_id or None))
+    if codec_type == "video":
+        stream.width = fields.get(0xB0)
+        stream.height = fields.get(0xBA)
+        stream.bit_depth, stream.pix_fmt = get_mkv_pixel_format(stream.codec_name, fields)
+        # DefaultDuration 为每帧纳秒数
+        if fields.get(0x23E383):
+            stream.frame_rate = 1000000000 / fields[0x23E383]
+    else:
+        stream.sample_rate = int(fields[0xB5]) if fields.get(0xB5) else 8000
+        stream.channels = fields.get(0x9F, 1)
+        stream.channel_layout = {1: "mono", 2: "stereo", 6: "5.1"}.get(stream.channels)
+    return stream
+
+def parse_mkv_header(file_path):
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        elements = iter_ebml_elements(data, 0, size)
+        header = next(elements, None)
+        if not header or header[0] != EBML_HEADER:
+            raise ValueError("not an EBML file")
+        segment = next(elements, None)
+        if not segment or segment[0] != EBML_SEGMENT:
+            raise ValueError("Segment element not found")
+
+        timecode_scale = 1000000
+        duration = None
+        streams = None
+        for element_id, start, end in iter_ebml_elements(data, segment[1], segment[2]):
+            if element_id == EBML_INFO:
+                for child_id, child_start, child_end in iter_ebml_elements(data, start, end):
+                    if child_id == 0x2AD7B1:
+                        timecode_scale = read_ebml_uint(data, child_start, child_end)
+                    elif child_id == 0x4489:
+                        duration = read_ebml_float(data, child_start, child_end)
+            elif element_id == EBML_TRACKS:
+                streams = []
+                for child_id, child_start, child_end in iter_ebml_elements(data, start, end):
+                    if child_id == 0xAE:
+                        stream = parse_mkv_track(data, child_start, child_end, len(streams))
+                        if stream:
+                            streams.append(stream)
+            # Info 和 Tracks 都已读取，或者已经到达媒体数据，不再继续
+            if (duration is not None and streams is not None) or element_id == EBML_CLUSTER:
+                break
+
+    if not duration or not streams:
+        raise ValueError("Info or Tracks element not found before the first Cluster")
+    duration = duration * timecode_scale / 1000000000
+    return MediaInfo(
+        duration=duration,
+        size=size,
+        bit_rate=int(size * 8 / duration),
+        format_name="matroska,webm",
+        streams=streams
+    )
+
+# 先尝试进程内的文件头解析，不支持或解析失败时返回 None
+def probe_fast(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension in MP4_EXTENSIONS:
+            return parse_mp4_header(file_path)
+        if extension in MKV_EXTENSIONS:
+            return parse_mkv_header(file_path)
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+    return None
+
+# 文件头解析结果是否包含像素格式和色深（解码配置缺失或是其它编码时没有这两项）
+def has_pixel_format(media):
+    video = media.first_stream("video")
+    return video is None or bool(video.pix_fmt and video.bit_depth)
+
+# 获取所有流的信息：优先解析文件头，否则使用 ffprobe 的 JSON 输出（结果保存在探测缓存中）
+# need_pixel_format=True 时，文件头中读不到视频流的像素格式和色深就改用 ffprobe
+def probe_media(file_path, need_pixel_format=True):
+    media = probe_fast(file_path)
+    if media is not None and (not need_pixel_format or has_pixel_format(media)):
+        return media
+    return parse_probe_json(probe_cached(file_path))
 
 def get_video_info(file_path):
     if not os.path.exists(file_path):
         print("file path does not exist!")
         return None
 
-    # 使用FFmpeg命令获取视频信息
-    ffmpeg_cmd = [
-        "ffmpeg",
-        "-i", file_path,
-        "-hide_banner"
-    ]
-
     try:
-        # 执行命令并捕获输出
-        result = subprocess.run(ffmpeg_cmd, stderr=subprocess.PIPE, text=True)
-        ffmpeg_output = result.stderr
-    except Exception as e:
-        print(f"Failed to execute FFmpeg: {e}")
+        media = probe_media(file_path)
+    except (OSError, subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        print(f"Failed to execute ffprobe: {e}")
         return None
 
-    # 初始化信息变量
-    width = height = bitrate = codec = color_depth = color_space = frame_rate = duration = None
-    audio_codec = sample_rate = channels = None
-
-    # 解析FFmpeg输出
-    # 获取视频分辨率
-    resolution_match = re.search(r"(\d{2,5})x(\d{2,5})", ffmpeg_output)
-    if resolution_match:
-        width, height = resolution_match.groups()
-
-    # 获取视频编码格式
-    codec_match = re.search(r"Video:\s(\w+)", ffmpeg_output)
-    if codec_match:
-        codec = codec_match.group(1)
-
-    # 获取色彩深度
-    color_depth_match = re.search(r"(\d{1,2})\s?bits", ffmpeg_output)
-    if color_depth_match:
-        color_depth = color_depth_match.group(1) + " bit"
-
-    # 获取色彩空间
-    color_space_match = re.search(r"(yuv\w+|rgb\w+)", ffmpeg_output)
-    if color_space_match:
-        color_space = color_space_match.group(1)
-
-    # 获取比特率
-    bitrate_match = re.search(r"bitrate:\s(\d+)\s?kb/s", ffmpeg_output)
-    if bitrate_match:
-        bitrate = int(bitrate_match.group(1)) * 1000
-
-    # 获取帧率
-    frame_rate_match = re.search(r"(\d+(?:\.\d+)?)\s?fps", ffmpeg_output)
-    if frame_rate_match:
-        frame_rate = float(frame_rate_match.group(1))
-
-    # 获取视频时长
-    duration_match = re.search(r"Duration:\s(\d+):(\d+):(\d+\.\d+)", ffmpeg_output)
-    if duration_match:
-        hours, minutes, seconds = map(float, duration_match.groups())
-        duration = hours * 3600 + minutes * 60 + seconds
-
-    # 获取音频信息
-    audio_codec_match = re.search(r"Audio:\s(\w+)", ffmpeg_output)
-    if audio_codec_match:
-        audio_codec = audio_codec_match.group(1)
-
-    # 获取音频采样率
-    sample_rate_match = re.search(r"(\d+)\s?Hz", ffmpeg_output)
-    if sample_rate_match:
-        sample_rate = int(sample_rate_match.group(1))
-
-    # 获取音频声道数
-    channels_match = re.search(r",\s(stereo|mono|5\.1)", ffmpeg_output)
-    if channels_match:
-        channels = channels_match.group(1)
+    video = media.first_stream("video")
+    audio = media.first_stream("audio")
 
     # 获取文件大小
-    file_size = os.path.getsize(file_path)
+    file_size = media.size or os.path.getsize(file_path)
 
     # 创建视频信息字典
     video_info = {
-        "resolution": f"{width}x{height}" if width and height else "Unknown",
-        "bitrate": f"{bitrate / 1000:.2f} kbps" if bitrate else "Unknown",
-        "video_codec": codec,
-        "color_depth": color_depth if color_depth else "Unknown",
-        "color_space": color_space if color_space else "Unknown",
-        "frame_rate": f"{frame_rate:.2f} fps" if frame_rate else "Unknown",
-        "duration": f"{duration:.2f} seconds" if duration else "Unknown",
+        "resolution": f"{video.width}x{video.height}" if video and video.width and video.height else "Unknown",
+        "bitrate": f"{media.bit_rate / 1000:.2f} kbps" if media.bit_rate else "Unknown",
+        "video_codec": video.codec_name if video else None,
+        "color_depth": f"{video.bit_depth} bit" if video and video.bit_depth else "Unknown",
+        "color_space": video.pix_fmt if video and video.pix_fmt else "Unknown",
+        "frame_rate": f"{video.frame_rate:.2f} fps" if video and video.frame_rate else "Unknown",
+        "duration": f"{media.duration:.2f} seconds" if media.duration else "Unknown",
         "file_size": f"{file_size / (1024**2):.2f} MB" if file_size else "Unknown",
-        "audio_codec": audio_codec if audio_codec else "Unknown",
-        "sample_rate": f"{sample_rate / 1000:.1f} kHz" if sample_rate else "Unknown",
-        "channels": channels if channels else "Unknown"
+        "audio_codec": audio.codec_name if audio and audio.codec_name else "Unknown",
+        "sample_rate": f"{audio.sample_rate / 1000:.1f} kHz" if audio and audio.sample_rate else "Unknown",
+        "channels": (audio.channel_layout or audio.channels) if audio and (audio.channel_layout or audio.channels)
+        else "Unknown"
     }
 
     return video_info
 
-# 用户输入视频路径
-video_path = input("Enter the video file path: ")
-info = get_video_info(video_path)
-if info:
-    print("Video Information:")
-    for key, value in info.items():
-        print(f"{key.capitalize()}: {value}")
+# 数据包级分析：逐块读取 ffprobe 输出到 NumPy 数组，统计每秒码率、滑动窗口峰值码率和 GOP 结构
+def analyze_packets(file_path, peak_windows=(1, 5), chunk_lines=65536, dump_path=None):
+    # NumPy 只有数据包分析需要，按需导入，其余功能不依赖它
+    import numpy as np
+
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,size,flags", "-of", "csv=p=0", file_path
+    ]
+
+    # 每秒比特数随时长增长，其余统计按块累加，内存占用与数据包数量无关
+    bits_per_second = np.zeros(3600, dtype=np.float64)
+    keyframe_times = []
+    gop_lengths = []
+    packet_count = 0
+    last_keyframe = None
+    max_second = -1
+    # 第一个有效时间戳作为起点（流的起始时间可能不为 0，B 帧流的 dts 可能为负）
+    origin = None
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as process:
+        while True:
+            lines = [line for line in itertools.islice(process.stdout, chunk_lines) if line.strip()]
+            if not lines:
+                break
+            fields = [line.strip().split(",") for line in lines]
+
+            # 优先使用解码时间戳（按解码顺序单调递增）
+            times = np.array([
+                float(f[1]) if f[1] != "N/A" else float(f[0]) if f[0] != "N/A" else np.nan for f in fields
+            ])
+            sizes = np.array([int(f[2]) if f[2].isdigit() else 0 for f in fields], dtype=np.int64)
+            keys = np.array(["K" in f[3] for f in fields] if len(fields[0]) > 3 else [False] * len(fields))
+
+            # 相对起点按秒累加比特数；起点之前的数据包（时间戳乱序时）计入第 0 秒
+            valid = ~np.isnan(times)
+            if origin is None and valid.any():
+                origin = float(times[valid].min())
+            if origin is not None:
+                times = times - origin
+            seconds = np.maximum(times[valid], 0).astype(np.int64)
+            if len(seconds):
+                max_second = max(max_second, int(seconds.max()))
+                if max_second >= len(bits_per_second):
+                    grown = np.zeros(max(max_second + 1, len(bits_per_second) * 2))
+                    grown[:len(bits_per_second)] = bits_per_second
+                    bits_per_second = grown
+                bits_per_second[:max_second + 1] += np.bincount(
+                    seconds, weights=sizes[valid] * 8, minlength=max_second + 1
+                )[:max_second + 1]
+
+            # GOP 长度：相邻关键帧之间的数据包数
+            key_indices = np.flatnonzero(keys) + packet_count
+            if len(key_indices):
+                if last_keyframe is not None:
+                    gop_lengths.append(key_indices[0] - last_keyframe)
+                gop_lengths.extend(np.diff(key_indices).tolist())
+                last_keyframe = int(key_indices[-1])
+                keyframe_times.extend(times[keys].tolist())
+            packet_count += len(lines)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    bits_per_second = bits_per_second[:max_second + 1]
+    keyframe_times = np.array(keyframe_times)
+    gop_lengths = np.array(gop_lengths, dtype=np.int64)
+    keyframe_intervals = np.diff(keyframe_times)
+
+    summary = {
+        "packets": packet_count,
+        "duration": len(bits_per_second),
+        "average_bitrate": float(bits_per_second.mean()) if len(bits_per_second) else None,
+        "min_bitrate_1s": float(bits_per_second.min()) if len(bits_per_second) else None,
+        "keyframes": len(keyframe_times),
+        "gop_length_min": int(gop_lengths.min()) if len(gop_lengths) else None,
+        "gop_length_mean": float(gop_lengths.mean()) if len(gop_lengths) else None,
+        "gop_length_max": int(gop_lengths.max()) if len(gop_lengths) else None,
+        "gop_length_distribution": dict(zip(*map(np.ndarray.tolist, np.unique(gop_lengths, return_counts=True)))),
+        "keyframe_interval_min": float(keyframe_intervals.min()) if len(keyframe_intervals) else None,
+        "keyframe_interval_mean": float(keyframe_intervals.mean()) if len(keyframe_intervals) else None,
+        "keyframe_interval_max": float(keyframe_intervals.max()) if len(keyframe_intervals) else None
+    }
+    # 滑动窗口内的峰值平均码率（用于检查 VBV）
+    for window in peak_windows:
+        if len(bits_per_second) >= window:
+            summary[f"peak_bitrate_{window}s"] = float(
+                np.convolve(bits_per_second, np.ones(window), mode="valid").max() / window
+            )
+
+    # 可选：保存紧凑的二进制数据
+    if dump_path:
+        np.savez_compressed(
+            dump_path, bits_per_second=bits_per_second.astype(np.float32),
+            keyframe_times=keyframe_times, gop_lengths=gop_lengths.astype(np.uint32)
+        )
+    return summary
+
+# 批量扫描时识别的视频扩展名
+VIDEO_EXTENSIONS = {
+    ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi", ".flv", ".wmv",
+    ".ts", ".mts", ".m2ts", ".mpg", ".mpeg", ".3gp"
+}
+
+# 批量扫描输出的字段
+SCAN_FIELDS = [
+    "path", "duration", "size", "bit_rate", "format_name", "video_codec", "width", "height",
+    "pix_fmt", "bit_depth", "frame_rate", "audio_codec", "sample_rate", "channels", "error"
+]
+
+# 把 MediaInfo 整理为一行扫描结果
+def media_summary(path, media):
+    video = media.first_stream("video")
+    audio = media.first_stream("audio")
+    return {
+        "path": path,
+        "duration": media.duration,
+        "size": media.size,
+        "bit_rate": media.bit_rate,
+        "format_name": media.format_name,
+        "video_codec": video.codec_name if video else None,
+        "width": video.width if video else None,
+        "height": video.height if video else None,
+        "pix_fmt": video.pix_fmt if video else None,
+        "bit_depth": video.bit_depth if video else None,
+        "frame_rate": round(video.frame_rate, 3) if video and video.frame_rate else None,
+        "audio_codec": audio.codec_name if audio else None,
+        "sample_rate": audio.sample_rate if audio else None,
+        "channels": audio.channels if audio else None,
+        "error": None
+    }
+
+# 异步调用 ffprobe
+async def probe_async(path):
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-show_entries", PROBE_ENTRIES, "-of", "json", path,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors="replace").strip() or f"ffprobe exited with {process.returncode}")
+    return json.loads(stdout)
+
+# 并发扫描整个目录：已缓存的文件直接输出，其余文件在并发上限内探测，结果完成一个写一个
+async def scan_library(root, output_path, concurrency=8):
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"parsed": 0, "cached": 0, "probed": 0, "failed": 0}
+
+    with open(output_path, "w", newline="", encoding="utf-8") as output:
+        # 根据扩展名选择 CSV 或 JSON Lines
+        if output_path.lower().endswith(".csv"):
+            writer = csv.DictWriter(output, fieldnames=SCAN_FIELDS)
+            writer.writeheader()
+            write_row = writer.writerow
+        else:
+            write_row = lambda row: output.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+        def emit(row):
+            write_row(row)
+            output.flush()
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                path, stat = item
+                try:
+                    data = await probe_async(path)
+                    store_probe_cache(path, stat, data)
+                    emit(media_summary(path, parse_probe_json(data)))
+                    counts["probed"] += 1
+                except (OSError, RuntimeError, json.JSONDecodeError) as e:
+                    emit({"path": path, "error": str(e)})
+                    counts["failed"] += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+        # 遍历目录，跳过已缓存的文件
+        for directory, _, files in os.walk(root):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() not in VIDEO_EXTENSIONS:
+                    continue
+                path = os.path.abspath(os.path.join(directory, name))
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    emit({"path": path, "error": str(e)})
+                    counts["failed"] += 1
+                    continue
+                # 缓存中的 ffprobe 结果最完整，优先使用；其次解析文件头，与 probe_media 一样缺少像素格式时调用 ffprobe
+                data = lookup_probe_cache(path, stat)
+                if data is not None:
+                    emit(media_summary(path, parse_probe_json(data)))
+                    counts["cached"] += 1
+                    continue
+                media = probe_fast(path)
+                if media is not None and has_pixel_format(media):
+                    emit(media_summary(path, media))
+                    counts["parsed"] += 1
+                else:
+                    await queue.put((path, stat))
+
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    print(f"Scanned {sum(counts.values())} files: {counts['parsed']} parsed, {counts['cached']} cached, "
+          f"{counts['probed']} probed, {counts['failed']} failed.")
+    return counts
+
+if __name__ == "__main__":
+    # 批量扫描：python InfoGetter.py <folder> <output.jsonl|output.csv> [concurrency]
+    if len(sys.argv) >= 3:
+        asyncio.run(scan_library(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) >= 4 else 8))
+        sys.exit(0)
+
+    # 用户输入视频路径
+    video_path = input("Enter the video file path or a folder to scan: ")
+    if os.path.isdir(video_path):
+        output_path = input("Enter the output file (.jsonl or .csv): ").strip()
+        concurrency = input("Enter the number of concurrent probes (default 8): ").strip()
+        asyncio.run(scan_library(video_path, output_path, int(concurrency) if concurrency.isdigit() else 8))
+    else:
+        info = get_video_info(video_path)
+        if info:
+            print("Video Information:")
+            for key, value in info.items():
+                print(f"{key.capitalize()}: {value}")
+
+            # 可选的码率变化和 GOP 结构分析
+            if input("Analyze bitrate over time and GOP structure? (y/n): ").strip().lower() == "y":
+                dump_path = input("Enter a path to save the raw data (.npz, press Enter to skip): ").strip() or None
+                for key, value in analyze_packets(video_path, dump_path=dump_path).items():
+                    print(f"{key.capitalize()}: {value}")
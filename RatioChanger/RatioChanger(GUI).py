@@ -2,6 +2,11 @@ import os
 import subprocess
 import wx
 import re
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.filters import build_filter_chain
 
 def stretch_video(input_path, aspect_ratio, output_path):
     try:
@@ -32,8 +37,8 @@ def stretch_video(input_path, aspect_ratio, output_path):
         # 构建 ffmpeg 拉伸命令
         ffmpeg_command = [
             "ffmpeg", "-i", input_path, "-vf",
-            f"scale={new_width}:{new_height}", "-c:v", "libx264", "-crf", "23",
-            "-preset", "medium", output_path
+            build_filter_chain(source_size=(original_width, original_height), scale=(new_width, new_height)) or "null",
+            "-c:v", "libx264", "-crf", "23", "-preset", "medium", output_path
         ]
 
         # 执行 ffmpeg 命令
@@ -75,8 +80,10 @@ def crop_video(input_path, aspect_ratio, output_path):
         # 构建 ffmpeg 裁剪命令
         ffmpeg_command = [
             "ffmpeg", "-i", input_path, "-vf",
-            f"crop={new_width}:{new_height}:{crop_x}:{crop_y}", "-c:v", "libx264", "-crf", "23",
-            "-preset", "medium", output_path
+            build_filter_chain(
+                source_size=(original_width, original_height), crop=(new_width, new_height, crop_x, crop_y)
+            ) or "null",
+            "-c:v", "libx264", "-crf", "23", "-preset", "medium", output_path
         ]
 
         # 执行 ffmpeg 命令
@@ -1,4 +1,22 @@
 import subprocess
+import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.probe_cache import probe_cached
+from Common.filters import build_filter_chain
+
+# 获取原始视频宽高
+def get_video_size(input_path):
+    try:
+        streams = probe_cached(input_path).get("streams", [])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffprobe Error: {e.stderr.strip()}")
+    for stream in streams:
+        if stream.get("codec_type") == "video":
+            return int(stream["width"]), int(stream["height"])
+    raise RuntimeError("ffprobe Error: no video stream found")
 
 def stretch_video(input_path, aspect_ratio):
     try:
@@ -9,16 +27,8 @@ def stretch_video(input_path, aspect_ratio):
         # 获取输出路径
         output_path = input_path.rsplit(".", 1)[0] + f"_stretched_{aspect_ratio.replace(':', '_')}.mp4"
 
-        # 使用 ffmpeg 获取原始视频宽高
-        probe_command = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries",
-            "stream=width,height", "-of", "csv=p=0", input_path
-        ]
-        probe_result = subprocess.run(probe_command, capture_output=True, text=True)
-        if probe_result.returncode != 0:
-            raise RuntimeError(f"ffprobe Error: {probe_result.stderr.strip()}")
-
-        original_width, original_height = map(int, probe_result.stdout.strip().split(","))
+        # 获取原始视频宽高（使用探测缓存）
+        original_width, original_height = get_video_size(input_path)
         original_aspect = original_width / original_height
 
         # 计算新宽高
@@ -32,8 +42,8 @@ def stretch_video(input_path, aspect_ratio):
         # 构建 ffmpeg 拉伸命令
         ffmpeg_command = [
             "ffmpeg", "-i", input_path, "-vf",
-            f"scale={new_width}:{new_height}", "-c:v", "libx264", "-crf", "23",
-            "-preset", "medium", output_path
+            build_filter_chain(source_size=(original_width, original_height), scale=(new_width, new_height)) or "null",
+            "-c:v", "libx264", "-crf", "23", "-preset", "medium", output_path
         ]
 
         # 执行 ffmpeg 命令
@@ -52,16 +62,8 @@ def crop_video(input_path, aspect_ratio):
         # 获取输出路径
         output_path = input_path.rsplit(".", 1)[0] + f"_cropped_{aspect_ratio.replace(':', '_')}.mp4"
 
-        # 使用 ffmpeg 获取原始视频宽高
-        probe_command = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries",
-            "stream=width,height", "-of", "csv=p=0", input_path
-        ]
-        probe_result = subprocess.run(probe_command, capture_output=True, text=True)
-        if probe_result.returncode != 0:
-            raise RuntimeError(f"ffprobe 错误：{probe_result.stderr.strip()}")
-
-        original_width, original_height = map(int, probe_result.stdout.strip().split(","))
+        # 获取原始视频宽高（使用探测缓存）
+        original_width, original_height = get_video_size(input_path)
         original_aspect = original_width / original_height
 
         # 计算裁剪区域
@@ -79,8 +81,10 @@ def crop_video(input_path, aspect_ratio):
         # 构建 ffmpeg 裁剪命令
         ffmpeg_command = [
             "ffmpeg", "-i", input_path, "-vf",
-            f"crop={new_width}:{new_height}:{crop_x}:{crop_y}", "-c:v", "libx264", "-crf", "23",
-            "-preset", "medium", output_path
+            build_filter_chain(
+                source_size=(original_width, original_height), crop=(new_width, new_height, crop_x, crop_y)
+            ) or "null",
+            "-c:v", "libx264", "-crf", "23", "-preset", "medium", output_path
         ]
 
         # 执行 ffmpeg 命令
@@ -2,6 +2,11 @@ import os
 import subprocess
 import wx
 import re
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.filters import build_filter_chain
 
 def is_valid_windows_filename(filename: str) -> bool:
     # 检查是否包含非法字符
@@ -27,6 +32,9 @@ def is_valid_windows_filename(filename: str) -> bool:
 
 def change_video_speed(video_path, output_path, speed, keep_pitch):
     try:
+        # 视频滤镜链要在下面拆分 atempo 之前用原始速度构建
+        video_filter = build_filter_chain(setpts=1 / speed) or "null"
+
         # 速度超过atempo的处理
         atempo_filters = []
         while speed > 2.0:
@@ -39,14 +47,14 @@ def change_video_speed(video_path, output_path, speed, keep_pitch):
             # 保持音调
             cmd = [
                 "ffmpeg", "-i", video_path, "-filter_complex",
-                f"[0:v]setpts={1/speed}*PTS[v];[0:a]{atempo_filter}[a]",
+                f"[0:v]{video_filter}[v];[0:a]{atempo_filter}[a]",
                 "-map", "[v]", "-map", "[a]", output_path
             ]
         else:
             # 不保持音调
             cmd = [
                 "ffmpeg", "-i", video_path, "-filter_complex",
-                f"[0:v]setpts={1/speed}*PTS[v];[0:a]{atempo_filter}[a]",
+                f"[0:v]{video_filter}[v];[0:a]{atempo_filter}[a]",
                 "-map", "[v]", "-map", "[a]", output_path
             ]
 
@@ -1,5 +1,10 @@
 import subprocess
 import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.filters import build_filter_chain
 
 def change_video_speed(video_path, output_path, speed, keep_pitch):
     try:
@@ -8,6 +13,9 @@ def change_video_speed(video_path, output_path, speed, keep_pitch):
         if speed <= 0:
             raise ValueError("Speed must be greater than 0.")
 
+        # Build the video chain before the atempo loop below reduces speed
+        video_filter = build_filter_chain(setpts=1 / speed) or "null"
+
         # Handle audio speed exceeding the atempo limit
         atempo_filters = []
         while speed > 2.0:
@@ -20,14 +28,14 @@ def change_video_speed(video_path, output_path, speed, keep_pitch):
             # Apply speed change while preserving audio pitch
             cmd = [
                 "ffmpeg", "-i", video_path, "-filter_complex",
-                f"[0:v]setpts={1/speed}*PTS[v];[0:a]{atempo_filter}[a]",
+                f"[0:v]{video_filter}[v];[0:a]{atempo_filter}[a]",
                 "-map", "[v]", "-map", "[a]", output_path
             ]
         else:
             # Apply speed change without preserving audio pitch
             cmd = [
                 "ffmpeg", "-i", video_path, "-filter_complex",
-                f"[0:v]setpts={1/speed}*PTS[v];[0:a]{atempo_filter}[a]",
+                f"[0:v]{video_filter}[v];[0:a]{atempo_filter}[a]",
                 "-map", "[v]", "-map", "[a]", output_path
             ]
 
@@ -0,0 +1,115 @@
+import subprocess
+import json
+import os
+import sys
+
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.packaging import PACKAGE_CODECS, SEGMENT_SECONDS, get_package_type, build_package_options
+
+# 无法流复制时使用的编码器
+FALLBACK_ENCODERS = {'video': 'libx264', 'audio': 'aac'}
+MEDIA_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm', '.ts', '.m4v')
+
+def probe_streams(video_path):
+    # 获取各条流的类型和编码
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,codec_name", "-of", "json", video_path],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout).get("streams", [])
+
+def collect_inputs(paths):
+    # 目录（例如 CompressionMaster 的码率阶梯输出）展开为其中的媒体文件
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            inputs.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(MEDIA_EXTENSIONS)
+            )
+        else:
+            inputs.append(path)
+    return inputs
+
+def get_codec_options(stream_type, output_index, codec_name, package_type, segment_seconds):
+    spec = f"{stream_type[0]}:{output_index}"
+    if codec_name in PACKAGE_CODECS[package_type][stream_type]:
+        options = [f"-c:{spec}", "copy"]
+        if codec_name == 'hevc' and package_type != 'hls_ts':
+            # Apple 设备要求 fMP4 中的 HEVC 使用 hvc1 标签
+            options += [f"-tag:{spec}", "hvc1"]
+        return options, 'copy'
+
+    options = [f"-c:{spec}", FALLBACK_ENCODERS[stream_type]]
+    if stream_type == 'video':
+        # 重新编码时按切片时长放置关键帧，保证每个切片都能独立解码
+        options += [f"-force_key_frames:{spec}", f"expr:gte(t,n_forced*{segment_seconds})"]
+    return options, FALLBACK_ENCODERS[stream_type]
+
+# 打包已经编码完成的文件；需要边编码边打包时，使用 CompressionMaster 码率阶梯模式的切片输出
+def package_stream(input_paths, output_dir, package_format='hls', segment_type='fmp4',
+                   segment_seconds=SEGMENT_SECONDS, event=True):
+    inputs = collect_inputs(input_paths)
+    if not inputs:
+        print("No input files found")
+        return False
+
+    package_type = get_package_type(package_format, segment_type)
+    command = ["ffmpeg", "-y"]
+    for input_path in inputs:
+        command += ["-i", input_path]
+
+    # 每个输入取第一条视频流和第一条音频流，能复制的流直接复制
+    maps, codec_options, variants = [], [], []
+    video_count = audio_count = 0
+    for input_index, input_path in enumerate(inputs):
+        streams = probe_streams(input_path)
+        variant = []
+        for stream_type in ('video', 'audio'):
+            stream = next((s for s in streams if s.get("codec_type") == stream_type), None)
+            if stream is None:
+                continue
+            output_index = video_count if stream_type == 'video' else audio_count
+            options, method = get_codec_options(
+                stream_type, output_index, stream.get("codec_name"), package_type, segment_seconds
+            )
+            maps += ["-map", f"{input_index}:{stream_type[0]}:0"]
+            codec_options += options
+            variant.append(f"{stream_type[0]}:{output_index}")
+            print(f"{os.path.basename(input_path)} {stream_type} ({stream.get('codec_name')}): {method}")
+            if stream_type == 'video':
+                video_count += 1
+            else:
+                audio_count += 1
+        variants.append(",".join(variant))
+    command += maps + codec_options
+
+    os.makedirs(output_dir, exist_ok=True)
+    command += build_package_options(
+        output_dir, package_format, segment_type, segment_seconds, variants, audio_count > 0, event
+    )
+
+    try:
+        subprocess.run(command, check=True)
+        print(f"Packaging complete: {output_dir}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print("Fail to package:", e)
+        return False
+
+if __name__ == "__main__":
+    # 获取输入文件（或码率阶梯输出目录）、输出目录和打包格式
+    input_paths = input("Enter input files or a ladder folder (separate multiple paths with ';'): ").strip()
+    input_paths = [path.strip() for path in input_paths.split(';') if path.strip()]
+    output_dir = input("Enter the output folder: ").strip()
+
+    print("Choose a package format: 1. HLS (fMP4)  2. HLS (TS)  3. DASH")
+    format_choice = input("Please choose (1/2/3): ").strip()
+    package_format = 'dash' if format_choice == '3' else 'hls'
+    segment_type = 'ts' if format_choice == '2' else 'fmp4'
+
+    segment_seconds = input(f"Enter the segment duration in seconds (default is {SEGMENT_SECONDS}): ").strip()
+    segment_seconds = float(segment_seconds) if segment_seconds else SEGMENT_SECONDS
+
+    package_stream(input_paths, output_dir, package_format, segment_type, segment_seconds)
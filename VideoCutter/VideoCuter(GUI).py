@@ -1,111 +1,13 @@
 import re
 import wx
-import platform
 import subprocess
+import os
+import sys
 
-def auto_encode(selected_codec):
-    # 检测可用的硬件加速单元
-    system_platform = platform.system()
-    h264_support = []
-    hevc_support = []
-    vp8_support = []
-    vp9_support = []
-    av1_support = []
-    prores_support = []
-
-    # 运行FFmpeg命令以列出可用的编码器
-    ffmpeg_output = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True)
-    # 根据平台检查可用的编码器
-    if system_platform in ['Windows', 'Linux']:
-
-        # 检查NVIDIA NVENC支持
-        if "h264_nvenc" in ffmpeg_output.stdout:
-            h264_support.append('nvenc')
-        if "hevc_nvenc" in ffmpeg_output.stdout:
-            hevc_support.append('nvenc')
-        if "av1_nvenc" in ffmpeg_output.stdout:
-            av1_support.append('nvenc')
-        if "prores_nvenc" in ffmpeg_output.stdout:
-            prores_support.append('nvenc')
-        if "vp8_nvenc" in ffmpeg_output.stdout:
-            vp8_support.append('nvenc')
-        if "vp9_nvenc" in ffmpeg_output.stdout:
-            vp9_support.append('nvenc')
-
-        # 检查Intel QSV支持
-        if "h264_qsv" in ffmpeg_output.stdout:
-            h264_support.append('qsv')
-        if "hevc_qsv" in ffmpeg_output.stdout:
-            hevc_support.append('qsv')
-        if "av1_qsv" in ffmpeg_output.stdout:
-            av1_support.append('qsv')
-        if "prores_qsv" in ffmpeg_output.stdout:
-            prores_support.append('qsv')
-        if "vp8_qsv" in ffmpeg_output.stdout:
-            vp8_support.append('qsv')
-        if "vp9_qsv" in ffmpeg_output.stdout:
-            vp9_support.append('qsv')
-
-        # 检查AMD AMF支持
-        if "h264_amf" in ffmpeg_output.stdout:
-            h264_support.append('amf')
-        if "hevc_amf" in ffmpeg_output.stdout:
-            hevc_support.append('amf')
-        if "av1_amf" in ffmpeg_output.stdout:
-            av1_support.append('amf')
-        if "prores_amf" in ffmpeg_output.stdout:
-            prores_support.append('amf')
-        if "vp8_amf" in ffmpeg_output.stdout:
-            vp8_support.append('amf')
-        if "vp9_amf" in ffmpeg_output.stdout:
-            vp9_support.append('amf')
-
-    elif system_platform == 'Darwin':  # macOS 平台
-        if "h264_videotoolbox" in ffmpeg_output.stdout:
-            h264_support.append('videotoolbox')
-        if "hevc_videotoolbox" in ffmpeg_output.stdout:
-            hevc_support.append('videotoolbox')
-        if 'prores_videotoolbox' in ffmpeg_output.stdout:
-            prores_support.append('videotoolbox')
-        if 'av1_videotoolbox' in ffmpeg_output.stdout:
-            av1_support.append('videotoolbox')
-        if 'vp8_videotoolbox' in ffmpeg_output.stdout:
-            vp8_support.append('videotoolbox')
-        if 'vp9_videotoolbox' in ffmpeg_output.stdout:
-            vp9_support.append('videotoolbox')
-
-    if selected_codec == 'h264':
-        if h264_support:
-            return h264_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'hevc':
-        if hevc_support:
-            return hevc_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'av1':
-        if av1_support:
-            return av1_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'prores':
-        if prores_support:
-            return prores_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp8':
-        if vp8_support:
-            return vp8_support[0]
-        else:
-            return 'cpu'
-    elif selected_codec == 'vp9':
-        if vp9_support:
-            return vp9_support[0]
-        else:
-            return 'cpu'
-    else:
-        return 'cpu'
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.capabilities import auto_encode
+from Common.keyframe_index import plan_seek
 
 def is_valid_time_format(time_str):
     # 正则表达式匹配 hh:mm:ss 格式（支持秒部分带小数）
@@ -166,19 +68,11 @@ def calculate_seconds_difference(start_time: str, end_time: str) -> str:
 
 def cut_video_ffmpeg(video_path, encode_mode, encode_speed, output_path, start_time=None, end_time=None):
     try:
-        ffmpeg_command = ['ffmpeg']
-        # 如果有 start_time，则添加 -ss 参数
-        if start_time:
-            ffmpeg_command.extend(['-ss', str(start_time)])
-
-        # 添加输入文件路径
-        ffmpeg_command.extend(['-i', video_path])
-
-        # 如果有 end_time，则计算时间差并添加 -t 参数
-        if end_time:
-            ffmpeg_command.extend(
-                ['-t', calculate_seconds_difference(str(start_time) if start_time else "00:00:00", str(end_time))]
-            )
+        start_seconds = float(calculate_seconds_difference("00:00:00", str(start_time))) if start_time else 0
+        end_seconds = float(calculate_seconds_difference("00:00:00", str(end_time))) if end_time else None
+        # 输入端粗定位，输出端补上到起点的剩余部分
+        input_seek, output_seek = plan_seek(video_path, start_seconds, end_seconds)
+        ffmpeg_command = ['ffmpeg'] + input_seek + ['-i', video_path] + output_seek
 
         encode_process = auto_encode(encode_mode)
         if encode_process != 'cpu':
@@ -1,26 +1,38 @@
 import subprocess
+import tempfile
+import sys
+import csv
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
 import re
 
+# 仓库根目录下的 Common 包含各工具共用的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.keyframe_index import (
+    load_keyframe_index, find_keyframe_before, find_keyframe_after, get_copy_range_bytes, get_seek_point, plan_seek
+)
+from Common.scenes import get_frame_rate, detect_scenes
+
 def remove_trailing_backslash(path: str) -> str:
     # 如果路径以反斜杠结尾，去掉它
     if path.endswith('\\'):
         return path[:-1]
     return path
 
-def calculate_seconds_difference(start_time: str, end_time: str) -> str:
-    def time_to_seconds(time_str: str) -> float:
-        # 如果是 hh:mm:ss 或者 hh:mm:ss.sss 格式，按原逻辑转换为秒
-        if ":" in time_str:
-            parts = time_str.split(":")
-            h = int(parts[0])
-            m = int(parts[1])
-            s = float(parts[2])  # 支持秒部分为小数
-            return h * 3600 + m * 60 + s
-        else:
-            # 如果是纯秒数，直接转换为浮点数
-            return float(time_str)
+def time_to_seconds(time_str: str) -> float:
+    # 如果是 hh:mm:ss 或者 hh:mm:ss.sss 格式，按原逻辑转换为秒
+    if ":" in time_str:
+        parts = time_str.split(":")
+        h = int(parts[0])
+        m = int(parts[1])
+        s = float(parts[2])  # 支持秒部分为小数
+        return h * 3600 + m * 60 + s
+    else:
+        # 如果是纯秒数，直接转换为浮点数
+        return float(time_str)
 
+def calculate_seconds_difference(start_time: str, end_time: str) -> str:
     # 将开始时间和结束时间转换为秒数
     start_total_seconds = time_to_seconds(start_time)
     end_total_seconds = time_to_seconds(end_time)
@@ -51,25 +63,416 @@ def is_valid_windows_filename(filename: str) -> bool:
     return True
 
 # 定义一个函数来调用 ffmpeg 截取视频片段
-def cut_video_ffmpeg(video_path, start_time, end_time, output_path):
+def cut_video_ffmpeg(video_path, start_time, end_time, output_path, threads=None):
     try:
+        # 输入端粗定位到关键帧并读到终点为止，输出端精确定位
+        input_seek, output_seek = plan_seek(video_path, time_to_seconds(str(start_time)), time_to_seconds(str(end_time)))
         ffmpeg_command = [
-            'ffmpeg',
-            '-ss', str(start_time),     # 起始时间
+            'ffmpeg', '-nostdin',
+            *input_seek,
             '-i', video_path,          # 输入视频文件
-            '-t', calculate_seconds_difference(str(start_time), str(end_time)),  # 截取的持续时间
+            *output_seek,
             '-c:v', 'libx264',
-            '-preset', 'veryslow',
-            output_path                 # 输出文件路径
+            '-preset', 'veryslow'
         ]
+        # 限制 ffmpeg 使用的线程数
+        if threads:
+            ffmpeg_command.extend(['-threads', str(threads)])
+        ffmpeg_command.append(output_path)  # 输出文件路径
 
         # 调用 ffmpeg 命令
         subprocess.run(ffmpeg_command, check=True)
         print(f"Saved as: {output_path}")
         print("\tSuccess!\t\t\t\t")
+        return True, None
 
     except subprocess.CalledProcessError as e:
         print(f"Error: {e}")
+        return False, e
+
+# 获取视频流的编码参数（用于让重新编码的片段与原片段保持一致）
+def get_video_stream_info(video_path):
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,profile,pix_fmt,time_base',
+        '-of', 'json', video_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get('streams', [])
+    return streams[0] if streams else None
+
+# 智能剪切：完整的 GOP 直接复制码流，只重新编码起止处不完整的 GOP，最后拼接
+def smart_cut_video_ffmpeg(video_path, start_time, end_time, output_path, threads=None):
+    # 只有这些编码可以用对应的编码器重新编码首尾片段并与原码流拼接
+    smart_encoders = {'h264': 'libx264', 'hevc': 'libx265'}
+    thread_options = ['-threads', str(threads)] if threads else []
+
+    try:
+        start = time_to_seconds(str(start_time))
+        end = time_to_seconds(str(end_time))
+        stream_info = get_video_stream_info(video_path)
+        if not stream_info or stream_info.get('codec_name') not in smart_encoders:
+            print("\tSmart cut is not supported for this codec, falling back to re-encoding.\t")
+            return cut_video_ffmpeg(video_path, start_time, end_time, output_path, threads)
+
+        # 开放 GOP 中关键帧之后的前置 B 帧参考上一个 GOP，直接复制会花屏
+        index = load_keyframe_index(video_path)
+        if index['open_gop']:
+            print("\tThe stream uses open GOPs, falling back to re-encoding.\t")
+            return cut_video_ffmpeg(video_path, start_time, end_time, output_path, threads)
+
+        # 从关键帧索引中找到区间内第一个和最后一个关键帧
+        # 索引中是绝对时间戳，输入端 -ss 从容器起始时间计时（音频早于视频开始时，它早于第一个关键帧）
+        times = index['keyframe_times']
+        origin = index['start_time']
+        first_key = find_keyframe_after(index, origin + start)
+        last_key = find_keyframe_before(index, origin + end)
+        if first_key is None or last_key is None or last_key <= first_key:
+            print("\tNo complete GOP inside the range, falling back to re-encoding.\t")
+            return cut_video_ffmpeg(video_path, start_time, end_time, output_path, threads)
+        copy_start = times[first_key] - origin
+        copy_end = times[last_key] - origin
+        copy_mb = get_copy_range_bytes(index, first_key, last_key) / (1024 ** 2)
+        print(f"\tStream copying {copy_end - copy_start:.2f}s ({copy_mb:.2f} MB) between keyframes.\t")
+
+        # 重新编码时沿用原视频的编码参数
+        encode_options = ['-an', '-c:v', smart_encoders[stream_info['codec_name']], '-preset', 'veryslow'] + thread_options
+        if stream_info.get('pix_fmt'):
+            encode_options.extend(['-pix_fmt', stream_info['pix_fmt']])
+        profile = (stream_info.get('profile') or '').lower()
+        if stream_info['codec_name'] == 'h264' and profile in ['baseline', 'constrained baseline', 'main', 'high']:
+            encode_options.extend(['-profile:v', profile.replace('constrained ', '')])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pieces = []
+            # 起始处不完整的 GOP：重新编码
+            if copy_start - start > 0.001:
+                head_path = os.path.join(temp_dir, 'head.ts')
+                subprocess.run(
+                    ['ffmpeg', '-nostdin', '-v', 'error', '-ss', f'{start:.6f}', '-i', video_path,
+                     '-t', f'{copy_start - start:.6f}'] + encode_options + [head_path],
+                    check=True
+                )
+                pieces.append(head_path)
+
+            # 中间完整的 GOP：直接复制码流
+            middle_path = os.path.join(temp_dir, 'middle.ts')
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-v', 'error', '-ss', f'{copy_start:.6f}', '-i', video_path,
+                 '-t', f'{copy_end - copy_start:.6f}', '-an', '-c:v', 'copy',
+                 '-avoid_negative_ts', 'make_zero', middle_path],
+                check=True
+            )
+            pieces.append(middle_path)
+
+            # 结尾处不完整的 GOP：重新编码
+            if end - copy_end > 0.001:
+                tail_path = os.path.join(temp_dir, 'tail.ts')
+                subprocess.run(
+                    ['ffmpeg', '-nostdin', '-v', 'error', '-ss', f'{copy_end:.6f}', '-i', video_path,
+                     '-t', f'{end - copy_end:.6f}'] + encode_options + [tail_path],
+                    check=True
+                )
+                pieces.append(tail_path)
+
+            # 拼接视频片段，并从原视频截取同一区间的音频
+            list_path = os.path.join(temp_dir, 'pieces.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for piece in pieces:
+                    f.write(f"file '{piece}'\n")
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                 '-ss', f'{start:.6f}', '-t', f'{end - start:.6f}', '-i', video_path,
+                 '-map', '0:v', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac', '-y', output_path],
+                check=True
+            )
+
+        print(f"Saved as: {output_path}")
+        print("\tSuccess!\t\t\t\t")
+        return True, None
+
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error: {e}")
+        return False, e
+
+# 判断视频是否包含音频流
+def has_audio_stream(video_path):
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a',
+        '-show_entries', 'stream=index', '-of', 'csv=p=0', video_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return bool(result.stdout.strip())
+
+# 一次解码截取多个片段：segments 为 (start_time, end_time, output_name) 列表
+def cut_segments_ffmpeg(video_path, segments, output_path):
+    try:
+        ranges = [(time_to_seconds(str(start)), time_to_seconds(str(end)), name) for start, end, name in segments]
+        # 从最早的起点开始解码，到最晚的终点结束
+        base = min(start for start, _, _ in ranges)
+        last = max(end for _, end, _ in ranges)
+        # 已有关键帧索引时从起点前的关键帧开始读取，trim 的偏移相对这个定位点计算
+        base = get_seek_point(video_path, base)
+        audio = has_audio_stream(video_path)
+
+        # 用 split/trim 把同一路解码结果分给每个片段
+        count = len(ranges)
+        filters = [f"[0:v]split={count}" + ''.join(f'[v{i}]' for i in range(count))]
+        if audio:
+            filters.append(f"[0:a]asplit={count}" + ''.join(f'[a{i}]' for i in range(count)))
+        for i, (start, end, _) in enumerate(ranges):
+            filters.append(f"[v{i}]trim=start={start - base:.6f}:end={end - base:.6f},setpts=PTS-STARTPTS[ov{i}]")
+            if audio:
+                filters.append(f"[a{i}]atrim=start={start - base:.6f}:end={end - base:.6f},asetpts=PTS-STARTPTS[oa{i}]")
+
+        ffmpeg_command = [
+            'ffmpeg',
+            '-ss', f'{base:.6f}',       # 定位点
+            '-t', f'{last - base:.6f}', # 读取的总时长
+            '-i', video_path,
+            '-filter_complex', ';'.join(filters)
+        ]
+        # 每个片段一个输出
+        output_files = []
+        for i, (_, _, name) in enumerate(ranges):
+            output_file = f'{output_path}/{name}'
+            ffmpeg_command.extend(['-map', f'[ov{i}]'])
+            if audio:
+                ffmpeg_command.extend(['-map', f'[oa{i}]'])
+            ffmpeg_command.extend(['-c:v', 'libx264', '-preset', 'veryslow', output_file])
+            output_files.append(output_file)
+
+        # 调用 ffmpeg 命令
+        subprocess.run(ffmpeg_command, check=True)
+        for output_file in output_files:
+            print(f"Saved as: {output_file}")
+        print("\tSuccess!\t\t\t\t")
+        return True, None
+
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error: {e}")
+        return False, e
+
+# 用有限大小的工作池并行执行剪切任务：jobs 为 (video_path, start_time, end_time, output_file) 列表
+def cut_jobs_parallel(jobs, workers=None, smart=False):
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, len(jobs)))
+    # 平分 ffmpeg 线程，既占满 CPU 又不过度订阅
+    threads = max(1, cpu_count // workers)
+    cut_function = smart_cut_video_ffmpeg if smart else cut_video_ffmpeg
+
+    # 每个 ffmpeg 子进程本身就是独立进程，线程池只负责调度和等待
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (output_file, executor.submit(cut_function, video_path, start, end, output_file, threads))
+            for video_path, start, end, output_file in jobs
+        ]
+        # 按任务顺序收集结果
+        for output_file, future in futures:
+            try:
+                flag, error = future.result()
+            except Exception as e:
+                flag, error = False, e
+            results.append({'name': output_file, 'success': flag, 'error': str(error) if error else None})
+
+    # 汇总结果
+    failed = [result for result in results if not result['success']]
+    print(f"\t{len(results) - len(failed)}/{len(results)} segments succeeded.\t")
+    for result in failed:
+        print(f"\tFailed: {result['name']}: {result['error']}\t")
+    return results
+
+# 并行截取同一个视频的多个片段，返回每个片段的结果
+def cut_segments_parallel(video_path, segments, output_path, workers=None, smart=False):
+    jobs = [(video_path, start, end, f'{output_path}/{name}') for start, end, name in segments]
+    return cut_jobs_parallel(jobs, workers, smart)
+
+# 获取视频总时长（秒）
+def get_duration(video_path):
+    command = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+def seconds_to_time(seconds: float) -> str:
+    # 把秒数转换为 hh:mm:ss.sss 格式
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+# 读取 CSV 剪切列表，每行：视频路径,开始时间,结束时间,输出名称（可有表头）
+# 返回 (行号, 视频路径, 开始时间, 结束时间, 输出名称, 问题)，无法解析的行在“问题”中说明原因
+def read_csv_cut_list(list_path):
+    rows = []
+    base_dir = os.path.dirname(os.path.abspath(list_path))
+    with open(list_path, newline='', encoding='utf-8-sig') as f:
+        for line_number, row in enumerate(csv.reader(f), start=1):
+            row = [cell.strip() for cell in row]
+            if not any(row):
+                continue
+            # 跳过表头
+            if line_number == 1 and len(row) >= 3 and not is_valid_time_format(row[1]):
+                continue
+            if len(row) != 4:
+                rows.append((line_number, None, None, None, None, f"expected 4 columns, got {len(row)}"))
+                continue
+            video_path, start_time, end_time, output_name = row
+            rows.append((line_number, os.path.join(base_dir, video_path), start_time, end_time, output_name, None))
+    return rows
+
+# 把 EDL 时间码 hh:mm:ss:ff（丢帧时间码为 hh:mm:ss;ff）按源视频帧率换算为秒
+def timecode_to_seconds(timecode, frame_rate):
+    h, m, s, frames = map(int, re.split(r'[:;]', timecode))
+    if ';' not in timecode:
+        return h * 3600 + m * 60 + s + frames / frame_rate
+
+    # 丢帧时间码：除每第十分钟外，每分钟开头跳过 2（59.94 fps 为 4）个帧号
+    nominal = round(frame_rate)
+    if nominal not in (30, 60):
+        raise ValueError(f"drop-frame timecode {timecode} needs a 29.97 or 59.94 fps source")
+    dropped = nominal // 15
+    total_minutes = h * 60 + m
+    frame_number = (h * 3600 + m * 60 + s) * nominal + frames - dropped * (total_minutes - total_minutes // 10)
+    return frame_number / frame_rate
+
+# 读取 CMX3600 EDL 剪切列表，源文件来自 "* FROM CLIP NAME:" 或 "* SOURCE FILE:" 注释
+def read_edl_cut_list(list_path):
+    event_pattern = re.compile(
+        r'^(\d+)\s+\S+\s+\S+\s+\S+\s+(?:\d+\s+)?'
+        r'(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;]\d{2})'
+    )
+    base_dir = os.path.dirname(os.path.abspath(list_path))
+    list_name = os.path.splitext(os.path.basename(list_path))[0]
+    events = []
+    with open(list_path, encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            match = event_pattern.match(line)
+            if match:
+                events.append([line_number, match.group(1), match.group(2), match.group(3), None])
+            elif events and line.startswith('*') and ':' in line:
+                key, _, value = line[1:].partition(':')
+                if key.strip().upper() in ['FROM CLIP NAME', 'SOURCE FILE'] and value.strip():
+                    events[-1][4] = os.path.join(base_dir, value.strip())
+
+    # 时间码按源视频帧率换算为 hh:mm:ss.sss；探测失败只影响对应的行
+    rows = []
+    frame_rates = {}
+    for line_number, event, source_in, source_out, video_path in events:
+        output_name = f'{list_name}_{event}'
+        if not video_path:
+            rows.append((line_number, None, None, None, output_name, "no FROM CLIP NAME or SOURCE FILE comment"))
+            continue
+        if not os.path.isfile(video_path):
+            rows.append((line_number, video_path, None, None, output_name, f"input file {video_path} does not exist"))
+            continue
+        if video_path not in frame_rates:
+            try:
+                frame_rates[video_path] = get_frame_rate(video_path)
+            except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                frame_rates[video_path] = e
+        if isinstance(frame_rates[video_path], Exception):
+            rows.append((line_number, video_path, None, None, output_name,
+                         f"cannot get frame rate of {video_path}: {frame_rates[video_path]}"))
+            continue
+        try:
+            start_time, end_time = (
+                seconds_to_time(timecode_to_seconds(timecode, frame_rates[video_path]))
+                for timecode in [source_in, source_out]
+            )
+        except ValueError as e:
+            rows.append((line_number, video_path, None, None, output_name, str(e)))
+            continue
+        rows.append((line_number, video_path, start_time, end_time, output_name, None))
+    return rows
+
+# 一次性检查所有剪切任务，返回 (任务列表, 错误列表)
+def validate_cut_list(rows, output_path):
+    jobs = []
+    errors = []
+    durations = {}
+    output_files = set()
+
+    # 输出目录也在编码开始前检查
+    if not os.path.isdir(output_path):
+        errors.append(f"Output folder {output_path} does not exist")
+    elif not os.access(output_path, os.W_OK):
+        errors.append(f"Output folder {output_path} is not writable")
+
+    for line_number, video_path, start_time, end_time, output_name, problem in rows:
+        if problem:
+            errors.append(f"Line {line_number}: {problem}")
+            continue
+        if not os.path.isfile(video_path):
+            errors.append(f"Line {line_number}: input file {video_path} does not exist")
+            continue
+        if not is_valid_time_format(start_time) or not is_valid_time_format(end_time):
+            errors.append(f"Line {line_number}: invalid time format")
+            continue
+        if float(calculate_seconds_difference(start_time, end_time)) <= 0:
+            errors.append(f"Line {line_number}: end time must be later than start time")
+            continue
+        if not is_valid_windows_filename(output_name):
+            errors.append(f"Line {line_number}: output name {output_name} is not legal")
+            continue
+
+        # 检查时间范围是否超出视频时长，每个视频只探测一次
+        if video_path not in durations:
+            try:
+                durations[video_path] = get_duration(video_path)
+            except (subprocess.CalledProcessError, ValueError, OSError):
+                durations[video_path] = None
+        if durations[video_path] is None:
+            errors.append(f"Line {line_number}: cannot get duration of {video_path}")
+            continue
+        if float(calculate_seconds_difference("0", end_time)) > durations[video_path]:
+            errors.append(
+                f"Line {line_number}: end time {end_time} exceeds video duration {durations[video_path]:.2f}s"
+            )
+            continue
+
+        output_file = f'{output_path}/{output_name}.mp4'
+        if output_file in output_files:
+            errors.append(f"Line {line_number}: duplicate output name {output_name}")
+            continue
+        output_files.add(output_file)
+        jobs.append((video_path, start_time, end_time, output_file))
+
+    return jobs, errors
+
+# 批量模式：读取 EDL/CSV 剪切列表，全部检查通过后再交给工作池
+def run_cut_list(list_path, output_path, workers=None, smart=False):
+    if list_path.lower().endswith('.edl'):
+        rows = read_edl_cut_list(list_path)
+    else:
+        rows = read_csv_cut_list(list_path)
+
+    jobs, errors = validate_cut_list(rows, output_path.rstrip('/\\'))
+    if errors:
+        for error in errors:
+            print(f"\t{error}\t")
+        print(f"\t{len(errors)} problems found, nothing was cut.\t")
+        return None
+    if not jobs:
+        print("\tNo cuts found in the list.\t")
+        return []
+
+    return cut_jobs_parallel(jobs, workers, smart)
+
+# 在场景边界处自动分割视频
+def split_at_scenes(video_path, output_path, threshold=0.3, min_scene_length=1.0, smart=False):
+    boundaries = detect_scenes(video_path, threshold, min_scene_length)
+    duration = get_duration(video_path)
+    points = [0.0] + [time for time in boundaries if time < duration] + [duration]
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    segments = [
+        (seconds_to_time(start), seconds_to_time(end), f'{base_name}_scene{i + 1:03d}.mp4')
+        for i, (start, end) in enumerate(zip(points, points[1:]))
+    ]
+    print(f"\tFound {len(segments)} scenes.\t")
+    return cut_segments_parallel(video_path, segments, output_path, smart=smart)
 
 def is_valid_time_format(time_str):
     # 正则表达式匹配 hh:mm:ss 格式（支持秒部分带小数）
@@ -124,11 +527,45 @@ def get_output_name():
         else:
             print(f"\tOutput name: {output_name} is not legal. Please try another one.\t")
 
+# 获取多个片段的起止时间和输出名称
+def get_segments_input():
+    segments = []
+    while True:
+        start_time = get_valid_time_input("Start time (format: hh:mm:ss or s): ")
+        end_time = get_valid_time_input("End time (format: hh:mm:ss or s): ")
+        output_name = get_output_name()
+        segments.append((start_time, end_time, output_name))
+        if input("Add another segment? (y/n): ").strip().lower() != 'y':
+            return segments
+
 if __name__ == "__main__":
+    # 批量模式：python VideoCutter.py <cuts.csv|cuts.edl> <output folder> [--smart]
+    if len(sys.argv) >= 3:
+        results = run_cut_list(sys.argv[1], sys.argv[2], smart='--smart' in sys.argv[3:])
+        sys.exit(0 if results is not None and all(result['success'] for result in results) else 1)
+
     while True:
         # 获取有效的输入视频文件路径
         video_path = get_valid_file_path()
 
+        # 询问是否按场景切换自动分割
+        if input("Split the video automatically at scene changes? (y/n): ").strip().lower() == 'y':
+            output_path = get_valid_output_path()
+            split_at_scenes(video_path, output_path)
+            continue
+
+        # 询问是否一次截取多个片段
+        if input("Cut multiple segments in one pass? (y/n): ").strip().lower() == 'y':
+            segments = get_segments_input()
+            output_path = get_valid_output_path()
+            # 片段多且分散时，并行截取更快
+            if input("Cut segments in parallel? (y/n): ").strip().lower() == 'y':
+                smart_cut = input("Use smart cut (stream copy full GOPs)? (y/n): ").strip().lower() == 'y'
+                cut_segments_parallel(video_path, segments, output_path, smart=smart_cut)
+            else:
+                cut_segments_ffmpeg(video_path, segments, output_path)
+            continue
+
         # 获取截取视频的开始时间和结束时间，确保时间格式正确
         start_time = get_valid_time_input("Start time (format: hh:mm:ss or s): ")
         end_time = get_valid_time_input("End time (format: hh:mm:ss or s): ")
@@ -137,5 +574,11 @@ if __name__ == "__main__":
         # 获取有效的输出路径
         output_path = get_valid_output_path()
 
+        # 询问是否使用智能剪切（只重新编码首尾不完整的 GOP）
+        smart_cut = input("Use smart cut (stream copy full GOPs)? (y/n): ").strip().lower() == 'y'
+
         # 调用函数截取视频
-        cut_video_ffmpeg(video_path, start_time, end_time, f'{output_path}/{output_name}')
+        if smart_cut:
+            smart_cut_video_ffmpeg(video_path, start_time, end_time, f'{output_path}/{output_name}')
+        else:
+            cut_video_ffmpeg(video_path, start_time, end_time, f'{output_path}/{output_name}')